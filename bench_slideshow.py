@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+"""
+Headless benchmarks for PySlideshow.
+
+Generates a synthetic image corpus (or reuses an existing one) and measures directory scan time, per-image decode and
+scale time, next image latency through MainWindow.next_image and peak RSS. The corpus is generated in a separate
+process, so the peak RSS only covers the benchmarks. Results are written as JSON so runs of
+different versions can be compared.
+
+Example:
+    python bench_slideshow.py --count 200 --width 6000 --height 4000 --format jpg --output before.json
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+#must be set before Qt is loaded
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide import QtCore
+from PySide.QtGui import QApplication, QColor, QImage, QLinearGradient, QPainter
+
+import pyslideshow
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of values (0 < p <= 100)."""
+    ordered = sorted(values)
+    rank = max(1, int(round(p / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+def summarize(seconds):
+    """Summary statistics of a list of timings, in milliseconds."""
+    if not seconds:
+        return None
+    ms = [s * 1000 for s in seconds]
+    return {
+        'count': len(ms),
+        'mean_ms': sum(ms) / len(ms),
+        'p50_ms': percentile(ms, 50),
+        'p99_ms': percentile(ms, 99),
+        'max_ms': max(ms),
+    }
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def generate_corpus(corpus_dir, count, size, fmt, seed):
+    """
+    Fill corpus_dir with count synthetic images. Existing files with the same names are reused, so a corpus only has to
+    be generated once.
+
+    Args:
+        corpus_dir: Directory to write the images to.
+        count: Number of images.
+        size (w,h): Dimensions of each image.
+        fmt: File format and suffix, e.g. 'jpg'.
+        seed: Seed for the random shapes drawn on each image.
+    """
+    rng = random.Random(seed)
+    os.makedirs(corpus_dir, exist_ok=True)
+
+    for n in range(count):
+        path = os.path.join(corpus_dir, 'bench_%06d.%s' % (n, fmt))
+        if os.path.exists(path):
+            continue
+
+        image = QImage(size[0], size[1], QImage.Format_RGB32)
+        painter = QPainter(image)
+        gradient = QLinearGradient(0, 0, size[0], size[1])
+        gradient.setColorAt(0, QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        gradient.setColorAt(1, QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        painter.fillRect(image.rect(), gradient)
+
+        #some detail, so the images don't compress unrealistically well
+        for _ in range(50):
+            color = QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256))
+            w = rng.randrange(1, size[0] // 4 + 2)
+            h = rng.randrange(1, size[1] // 4 + 2)
+            painter.fillRect(rng.randrange(size[0]), rng.randrange(size[1]), w, h, color)
+        painter.end()
+
+        image.save(path, fmt.upper(), 90)
+
+
+def bench_scan(corpus_dir, repeat):
+    """Time walking corpus_dir with the slideshow's DirectoryScanner, without the persistent index."""
+    timings = []
+    found = 0
+    for _ in range(repeat):
+        paths = []
+        scanner = pyslideshow.DirectoryScanner(corpus_dir, True, use_index=False)
+        scanner.found.connect(paths.extend)
+
+        start = time.perf_counter()
+        #run on this thread, so the found signal is delivered directly
+        scanner.run()
+        timings.append(time.perf_counter() - start)
+        found = len(paths)
+
+    return dict(summarize(timings), images=found)
+
+
+def bench_decode(paths, size, smooth):
+    """Time load_image on every path."""
+    timings = []
+    for path in paths:
+        start = time.perf_counter()
+        pyslideshow.load_image(path, size, smooth)
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+def bench_navigation(app, paths, size, steps, dwell):
+    """
+    Time MainWindow.next_image, the work done between a key press and the next image being on screen.
+
+    Args:
+        app (QApplication): Application whose events are processed between steps.
+        paths: Images to show.
+        size (w,h): Window size.
+        steps: Number of next_image calls to time.
+        dwell: Seconds to spend processing events after each step, which gives the prefetcher time to work like it
+            would while a user looks at a slide. 0 measures back to back navigation.
+    """
+    window = pyslideshow.MainWindow()
+    window.resize(size[0], size[1])
+    window.show()
+    app.processEvents()
+
+    window.image_paths = pyslideshow.Playlist(paths)
+    window.i = 0
+    window.set_navigation_enabled(True)
+    window.update_image()
+
+    timings = []
+    for _ in range(steps):
+        start = time.perf_counter()
+        window.next_image()
+        timings.append(time.perf_counter() - start)
+
+        deadline = time.perf_counter() + dwell
+        app.processEvents()
+        while time.perf_counter() < deadline:
+            app.processEvents(QtCore.QEventLoop.AllEvents, 5)
+            time.sleep(0.001)
+
+    result = dict(summarize(timings), cache=window.cache.stats())
+    window.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--corpus', help='directory of the image corpus (default: a temporary directory)')
+    parser.add_argument('--count', type=pyslideshow.positive_int, default=100, help='number of images to generate')
+    parser.add_argument('--width', type=pyslideshow.positive_int, default=4000, help='width of generated images')
+    parser.add_argument('--height', type=pyslideshow.positive_int, default=3000, help='height of generated images')
+    parser.add_argument('--format', default='jpg', choices=['jpg', 'png', 'bmp'], help='format of generated images')
+    parser.add_argument('--seed', type=int, default=0, help='seed for generating images')
+    parser.add_argument('--display', default='1920x1080', help='display size images are scaled to, WxH')
+    parser.add_argument('--fast', action='store_true', help='use fast instead of smooth scaling')
+    parser.add_argument('--scan-repeat', type=pyslideshow.positive_int, default=3,
+                        help='number of times to time the directory scan')
+    parser.add_argument('--steps', type=pyslideshow.positive_int, default=100,
+                        help='number of next image steps to time')
+    parser.add_argument('--dwell', type=float, default=0.2, help='seconds between next image steps')
+    parser.add_argument('--output', help='write results to this JSON file instead of stdout')
+    args = parser.parse_args()
+
+    display = tuple(int(x) for x in args.display.lower().split('x'))
+
+    tmp = None
+    corpus_dir = args.corpus
+    if corpus_dir is None:
+        tmp = tempfile.TemporaryDirectory(prefix='pyslideshow-bench-')
+        corpus_dir = tmp.name
+
+    #in a worker process, so the images drawn there don't count towards peak_rss_bytes; started before the
+    #QApplication exists, so it is not forked along with it
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=1, initializer=pyslideshow.init_worker) as executor:
+        executor.submit(generate_corpus, corpus_dir, args.count, (args.width, args.height), args.format,
+                        args.seed).result()
+    generate_time = time.perf_counter() - start
+
+    app = QApplication(sys.argv[:1])
+    paths = sorted(Path(corpus_dir).glob('bench_*.' + args.format))[:args.count]
+
+    results = {
+        'version': pyslideshow.__version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'qt_platform': os.environ.get('QT_QPA_PLATFORM'),
+        'corpus': {
+            'count': len(paths),
+            'width': args.width,
+            'height': args.height,
+            'format': args.format,
+            'generate_s': generate_time,
+        },
+        'display': display,
+        'smooth': not args.fast,
+        'scan': bench_scan(corpus_dir, args.scan_repeat),
+        'decode': bench_decode(paths, display, not args.fast),
+        'next_image': bench_navigation(app, paths, display, args.steps, args.dwell),
+        'peak_rss_bytes': peak_rss_bytes(),
+    }
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,18 +2,2052 @@
 """
 PySlideshow - A simple image slideshow viewer written in Python using PySide.
 """
+import argparse
+import errno
+import filecmp
+import hashlib
+import os
+import queue
+import struct
 import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
 
+import random
 from random import randint
 
+#startup is timed from here, before Qt is loaded. modules that are only needed once something is on screen (sqlite3,
+#concurrent.futures, json, urllib) are imported where they are used
+STARTED = time.perf_counter()
+
 from PySide import QtCore
-from PySide.QtGui import QApplication, QMainWindow, QFileDialog, QImage, QPixmap, QIcon, QInputDialog, QMessageBox
+from PySide.QtGui import (QApplication, QMainWindow, QFileDialog, QImage, QImageReader, QImageIOHandler, QPixmap, QIcon,
+                          QInputDialog, QLabel, QMessageBox, QPainter)
+
+__version__ = '1.0.0'
+
+from ui_slideshow import Ui_MainWindow
+from slideview import TRANSITION_NONE, TRANSITION_CROSSFADE, TRANSITION_PANZOOM
+import qrc_slideshow
+
+
+#file name suffixes of formats whose name differs from their usual suffix, or that have several
+FORMAT_SUFFIXES = {
+    'jpeg': ('.jpg', '.jpeg', '.jpe'),
+    'jpg': ('.jpg', '.jpeg', '.jpe'),
+    'tiff': ('.tif', '.tiff'),
+    'tif': ('.tif', '.tiff'),
+    'svgz': ('.svgz',),
+}
+
+#marks content hashes from the current sniff_image(). index entries with older hashes are checked again
+HASH_PREFIX = 's2:'
+
+#signatures at the start of files, for the formats that have one
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'BM', 'bmp'),
+    (b'II*\x00', 'tiff'),
+    (b'MM\x00*', 'tiff'),
+    (b'\x00\x00\x01\x00', 'ico'),
+    (b'P1', 'pbm'), (b'P4', 'pbm'),
+    (b'P2', 'pgm'), (b'P5', 'pgm'),
+    (b'P3', 'ppm'), (b'P6', 'ppm'),
+)
+
+
+@lru_cache(maxsize=None)
+def supported_formats():
+    """Names of the image formats Qt can read here, e.g. 'jpeg', depending on the installed image plugins."""
+    return frozenset(bytes(fmt).decode('ascii').lower() for fmt in QImageReader.supportedImageFormats())
+
+
+@lru_cache(maxsize=None)
+def image_suffixes():
+    """File name suffixes of the formats in supported_formats(), which the scan looks at."""
+    suffixes = set()
+    for fmt in supported_formats():
+        suffixes.add('.' + fmt)
+        suffixes.update(FORMAT_SUFFIXES.get(fmt, ()))
+    return frozenset(suffixes)
+
+
+def sniff_image(path, sample=65536, blocks=32, block_size=4096):
+    """
+    Check that path holds an image Qt can read, from its first and last bytes rather than by decoding it. Besides the
+    format signature, files in formats with an end marker must have it, which catches files that are truncated or still
+    being written. GIFs must end with theirs; JPEG and PNG files are searched through in full if the marker is not near
+    the end, since data can be appended to them (e.g. the video of a motion photo).
+
+    The same bytes, plus blocks spread evenly across the rest of the file, give a content hash for finding copies of
+    the same image without reading whole files. Images that only differ outside the sampled blocks get the same hash,
+    so a match has to be confirmed with same_contents() before a file is treated as a copy.
+
+    Args:
+        path: File to check.
+        sample: Number of bytes read from either end of the file.
+        blocks: Number of blocks sampled between the two ends.
+        block_size: Size of those blocks.
+
+    Returns:
+        (format, content hash), or None if the file is not a readable image.
+
+    Raises:
+        OSError: The file could not be read.
+    """
+    with open(str(path), 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        head = f.read(sample)
+        tail = b''
+        middle = []
+        if size > sample:
+            #offsets strictly between the head and the tail
+            span = size - 2 * sample
+            for n in range(1, blocks + 1):
+                offset = sample + span * n // (blocks + 1)
+                if span > 0 and offset + block_size <= size - sample:
+                    f.seek(offset)
+                    middle.append(f.read(block_size))
+            f.seek(max(sample, size - sample))
+            tail = f.read()
+    end = (head + tail)[-sample:]
+
+    fmt = None
+    for signature, name in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            fmt = name
+            break
+    else:
+        if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+            fmt = 'webp'
+        else:
+            #formats without a signature above are left to Qt, which only needs the header
+            buf = QtCore.QBuffer()
+            buf.setData(QtCore.QByteArray(head))
+            buf.open(QtCore.QIODevice.ReadOnly)
+            reader = QImageReader(buf)
+            if reader.canRead():
+                fmt = bytes(reader.format()).decode('ascii').lower()
+
+    if fmt is None or fmt not in supported_formats():
+        return None
+
+    #the markers are usually at the very end, files with data appended (e.g. motion photos) are checked in full
+    if fmt == 'jpeg' and b'\xff\xd9' not in end and not jpeg_complete(path):
+        return None
+    if fmt == 'png' and b'IEND' not in end[-64:] and not png_complete(path):
+        return None
+    if fmt == 'gif' and b';' not in end.rstrip(b'\x00')[-1:]:
+        return None
+
+    content_hash = hashlib.sha1(str(size).encode('ascii') + b'\0' + head + b''.join(middle) + tail)
+    return fmt, HASH_PREFIX + content_hash.hexdigest()
+
+
+def jpeg_complete(path):
+    """
+    Whether the JPEG at path has its end of image marker, also when other data follows it. The marker is searched for
+    from the first scan on, so the one ending an embedded EXIF thumbnail does not count.
+    """
+    with open(str(path), 'rb') as f:
+        if f.read(2) != b'\xff\xd8':
+            return False
+
+        #skip the segments before the first scan
+        while True:
+            if f.read(1) != b'\xff':
+                return False
+            marker = f.read(1)
+            while marker == b'\xff':
+                #fill bytes
+                marker = f.read(1)
+            if not marker:
+                return False
+            if marker == b'\xda':
+                break
+            if marker == b'\x01' or b'\xd0' <= marker <= b'\xd7':
+                #markers without a length
+                continue
+            length = f.read(2)
+            if len(length) < 2:
+                return False
+            f.seek(struct.unpack('>H', length)[0] - 2, os.SEEK_CUR)
+
+        #entropy coded data never contains the marker, 0xff bytes in it are followed by 0x00 or a restart marker
+        last = b''
+        while True:
+            chunk = f.read(1 << 20)
+            if not chunk:
+                return False
+            if b'\xff\xd9' in last + chunk:
+                return True
+            last = chunk[-1:]
+
+
+def png_complete(path):
+    """Whether the PNG at path has all its chunks up to and including IEND, also when other data follows it."""
+    with open(str(path), 'rb') as f:
+        f.seek(8)
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return False
+            length, kind = struct.unpack('>I4s', header)
+            if kind == b'IEND':
+                return True
+            #chunk data and CRC
+            f.seek(length + 4, os.SEEK_CUR)
+
+
+def same_contents(path, other):
+    """Whether two files have the same contents, comparing them in full. Unreadable files are never the same."""
+    try:
+        return filecmp.cmp(str(path), str(other), shallow=False)
+    except OSError:
+        return False
+
+
+def check_image(path):
+    """sniff_image() for use on a thread pool, treating unreadable files as invalid."""
+    try:
+        return sniff_image(path)
+    except OSError:
+        return None
+
+
+class Profiler(object):
+    """
+    Collects timing spans and counters from the hot paths. Keeps per-span aggregates for the performance overlay and,
+    while recording, every individual event so they can be written out as a trace. Spans can be recorded from any
+    thread.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.epoch = time.perf_counter() #trace timestamps are relative to this
+        self.recording = False #keep individual events for write_trace()
+        self.events = []
+        self.spans = {} #name -> [count, total seconds, last seconds, max seconds]
+        self.counters = {} #name -> value
+
+    @contextmanager
+    def span(self, name, **args):
+        """Time the enclosed block as a span called name. args are included in the trace."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.perf_counter(), args)
+
+    def add_span(self, name, start, end, args=None):
+        """Record a span that started and ended at the given time.perf_counter() values."""
+        duration = end - start
+        with self.lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                self.spans[name] = [1, duration, duration, duration]
+            else:
+                stats[0] += 1
+                stats[1] += duration
+                stats[2] = duration
+                stats[3] = max(stats[3], duration)
+
+            if self.recording:
+                self.events.append({
+                    'name': name,
+                    'ph': 'X',
+                    'ts': (start - self.epoch) * 1e6,
+                    'dur': duration * 1e6,
+                    'pid': os.getpid(),
+                    'tid': threading.get_ident(),
+                    'args': args or {},
+                })
+
+    def count(self, name, value):
+        """Set counter name to value."""
+        with self.lock:
+            self.counters[name] = value
+            if self.recording:
+                self.events.append({
+                    'name': name,
+                    'ph': 'C',
+                    'ts': (time.perf_counter() - self.epoch) * 1e6,
+                    'pid': os.getpid(),
+                    'args': {'value': value},
+                })
+
+    def summary(self):
+        """Lines of text describing the last and average duration of each span and the value of each counter."""
+        with self.lock:
+            lines = []
+            for name in sorted(self.spans):
+                count, total, last, longest = self.spans[name]
+                lines.append('%-12s last %7.1f ms  avg %7.1f ms  max %7.1f ms  n=%d' %
+                             (name, last * 1000, total / count * 1000, longest * 1000, count))
+            for name in sorted(self.counters):
+                lines.append('%-12s %s' % (name, self.counters[name]))
+        return lines
+
+    def write_trace(self, path):
+        """
+        Write the recorded events to path. Files ending in .jsonl get one JSON object per line, anything else gets
+        Chrome trace JSON, which chrome://tracing and Perfetto can open.
+        """
+        import json
+
+        with self.lock:
+            events = list(self.events)
+
+        with open(str(path), 'w') as f:
+            if str(path).endswith('.jsonl'):
+                for event in events:
+                    f.write(json.dumps(event) + '\n')
+            else:
+                json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+#hot path instrumentation, shared by the GUI and worker threads
+profiler = Profiler()
+
+
+class RenditionStore(object):
+    """
+    Directory of copies of images re-encoded at display sizes, so display nodes can read a few hundred kilobytes
+    instead of decoding the original.
+
+    Renditions are stored as <root>/<width>x<height>/<key[:2]>/<key>.jpg. The key is a hash of the source's file name,
+    size, modification time and first few kilobytes rather than of its path, so nodes that mount the image share at
+    different paths still find the same renditions, and a modified source no longer matches its stale rendition. The
+    first kilobytes hold the header and, for photos, the EXIF data, which tell apart different images that happen to
+    share a name, size and mtime, e.g. IMG_0001.jpg from two cameras.
+    """
+
+    def __init__(self, root):
+        """
+        Args:
+            root: Directory of the store. It does not have to exist yet.
+        """
+        self.root = str(root)
+        self.sizes = [] #rendition sizes in the store, smallest first
+        try:
+            for name in os.listdir(self.root):
+                try:
+                    w, h = (int(x) for x in name.split('x'))
+                except ValueError:
+                    continue
+                self.sizes.append((w, h))
+        except OSError:
+            pass
+        self.sizes.sort()
+
+    @staticmethod
+    def source_key(path, sample=4096):
+        """
+        Hash identifying the current version of the image at path.
+
+        Args:
+            sample: Number of bytes read from the start of the file.
+
+        Raises:
+            OSError: path could not be read.
+        """
+        with open(str(path), 'rb') as f:
+            st = os.fstat(f.fileno())
+            head = f.read(sample)
+        #whole seconds, because filesystems store modification times at different resolutions
+        text = os.path.basename(str(path)) + '\0' + str(st.st_size) + '\0' + str(int(st.st_mtime)) + '\0'
+        return hashlib.sha1(text.encode('utf-8', 'surrogateescape') + head).hexdigest()
+
+    def rendition_path(self, path, size, key=None):
+        """
+        Where the rendition of path at size is stored.
+
+        Args:
+            key: source_key() of path, if already known.
+        """
+        if key is None:
+            key = self.source_key(path)
+        return os.path.join(self.root, '%dx%d' % tuple(size), key[:2], key + '.jpg')
+
+    def lookup(self, path, size):
+        """
+        Find a rendition to show path from when it is scaled to fit size: the smallest one at least as large as size.
+
+        Returns:
+            str: Path of the rendition, or None if there is no suitable one and the original has to be used.
+        """
+        key = None
+        for rendition_size in self.sizes:
+            if rendition_size[0] >= size[0] and rendition_size[1] >= size[1]:
+                if key is None:
+                    try:
+                        key = self.source_key(path)
+                    except OSError:
+                        return None
+                rendition = self.rendition_path(path, rendition_size, key)
+                if os.path.exists(rendition):
+                    return rendition
+        return None
+
+
+#rendition store load_image() reads from when it has a suitable rendition, set from the command line
+renditions = None
+
+
+def fit_size(img_size, size):
+    """
+    Dimensions an image of img_size is scaled to so that it fits within size, preserving its aspect ratio. Images
+    smaller than size keep their dimensions.
+
+    Args:
+        img_size (w,h): Dimensions of the image.
+        size (w,h): Dimensions the image must fit within.
+    """
+    ratio = (img_size[0] / size[0], img_size[1] / size[1])
+    if max(ratio) <= 1:
+        return img_size
+
+    #the side that overshoots most decides the scale, an image with the same aspect ratio as size fills it exactly
+    if ratio[0] >= ratio[1]:
+        #scale image to label's width
+        return size[0], max(1, round(img_size[1] / ratio[0]))
+    else:
+        #scale to label's height
+        return max(1, round(img_size[0] / ratio[1])), size[1]
+
+
+def scale_image(image, size, smooth=True):
+    """
+    Scale image down so that it fits within size, preserving its aspect ratio. Images smaller than size are returned
+    unchanged.
+
+    Args:
+        image (QImage): Image to scale.
+        size (w,h): Dimensions the image must fit within.
+        smooth: Use smooth (bilinear) rather than fast (nearest neighbour) scaling.
+    """
+    img_size = (image.width(), image.height())
+    target = fit_size(img_size, size)
+
+    if target != img_size:
+        mode = QtCore.Qt.SmoothTransformation if smooth else QtCore.Qt.FastTransformation
+        image = image.scaled(target[0], target[1], QtCore.Qt.IgnoreAspectRatio, mode)
+
+    return image
+
+
+def read_ahead(path):
+    """
+    Hint to the kernel that the file at path will be read soon, so it can be fetched in the background while the job
+    that decodes it waits for a thread. Does nothing where the hint is not supported or the file cannot be opened.
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        #the readahead is started on the file's page cache, so it carries on after fd is closed
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def open_image_file(path):
+    """
+    Open the image at path for decoding. The file is read in a single bulk read into a buffer the decoder then reads
+    from, which avoids many small reads over network storage and keeps the decoder's reads out of Python.
+
+    Args:
+        path: Path of the image file.
+
+    Returns:
+        QIODevice: Device opened for reading. The caller closes it.
+
+    Raises:
+        OSError: The file could not be opened.
+    """
+    with open(str(path), 'rb') as f:
+        data = f.read()
+
+    device = QtCore.QBuffer()
+    device.setData(QtCore.QByteArray(data))
+    device.open(QtCore.QIODevice.ReadOnly)
+    return device
+
+
+def load_image(path, size, smooth=True):
+    """
+    Decode the image at path and scale it to fit size. Only uses QImage, so it is safe to call from worker threads.
+
+    Formats whose decoder can downscale while decoding (e.g. JPEG, which scales in the DCT domain) are decoded at
+    reduced resolution, so decode time and memory depend on size rather than on the dimensions of the file. In smooth
+    mode the decoder only reduces to twice the target size and the final step is a smooth scale; in fast mode the
+    decoder produces the target size directly.
+
+    If a RenditionStore is in use and holds a rendition of the image that is large enough, it is decoded instead.
+
+    Args:
+        path: Path of the image file.
+        size (w,h): Dimensions the image must fit within.
+        smooth: Favour quality over speed for the final scaling step.
+
+    Returns:
+        QImage: The scaled image, or a null QImage if the file could not be decoded.
+    """
+    with profiler.span('read'):
+        source = path
+        if renditions is not None:
+            source = renditions.lookup(path, size) or path
+        try:
+            device = open_image_file(source)
+        except OSError:
+            return QImage()
+
+    try:
+        with profiler.span('decode'):
+            reader = QImageReader(device)
+            src_size = reader.size()
+
+            if src_size.isValid() and reader.supportsOption(QImageIOHandler.ScaledSize):
+                img_size = (src_size.width(), src_size.height())
+                target = fit_size(img_size, size)
+                if smooth:
+                    target = fit_size(img_size, (target[0] * 2, target[1] * 2))
+                if target != img_size:
+                    reader.setScaledSize(QtCore.QSize(target[0], target[1]))
+
+            image = reader.read()
+    finally:
+        device.close()
+
+    if not image.isNull():
+        with profiler.span('scale'):
+            image = scale_image(image, size, smooth)
+
+    return image
+
+
+def cache_key(path, size):
+    """
+    Key identifying a scaled rendering of the image at path. Includes the file's modification time, so an image that is
+    changed on disk is not served from the cache.
+
+    Args:
+        path: Path of the image file.
+        size (w,h): Dimensions the image is scaled to fit.
+    """
+    try:
+        mtime = os.stat(str(path)).st_mtime_ns
+    except OSError:
+        mtime = None
+    return str(path), mtime, tuple(size)
+
+
+class PixmapCache(object):
+    """
+    Least recently used cache of scaled pixmaps, bounded by the total number of bytes the pixmaps occupy rather than by
+    the number of entries.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        """
+        Args:
+            max_bytes: Budget for the combined size of all cached pixmaps.
+        """
+        self.max_bytes = max_bytes
+        self.bytes = 0 #combined size of the cached pixmaps
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict() #cache_key -> QPixmap, least recently used first
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    @staticmethod
+    def pixmap_bytes(pixmap):
+        return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+    def get(self, key):
+        """Return the pixmap cached under key, or None. Counts towards the hit and miss counters."""
+        pixmap = self.entries.get(key)
+        if pixmap is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return pixmap
+
+    def put(self, key, pixmap):
+        """Add pixmap to the cache, evicting least recently used entries until the cache is within budget."""
+        self.remove(key)
+
+        size = self.pixmap_bytes(pixmap)
+        if size > self.max_bytes:
+            return
+
+        self.entries[key] = pixmap
+        self.bytes += size
+
+        while self.bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= self.pixmap_bytes(evicted)
+
+    def remove(self, key):
+        pixmap = self.entries.pop(key, None)
+        if pixmap is not None:
+            self.bytes -= self.pixmap_bytes(pixmap)
+
+    def discard(self, path):
+        """Remove every cached rendering of path."""
+        for key in [k for k in self.entries if k[0] == str(path)]:
+            self.remove(key)
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def stats(self):
+        """Summary of the cache's usage, for sizing max_bytes."""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class ImageLoader(QtCore.QRunnable):
+    """Decodes and scales a single image on a Prefetcher's thread pool."""
+
+    def __init__(self, prefetcher, generation, path, size, smooth, signal=None):
+        """
+        Args:
+            prefetcher (Prefetcher): Owner of the job.
+            generation: Prefetcher generation the job belongs to, or None if it cannot be cancelled.
+            path: Image to load.
+            size (w,h): Dimensions to scale the image to fit.
+            smooth: Scaling quality, see load_image().
+            signal: Signal the result is emitted with. Defaults to the prefetcher's loaded signal.
+        """
+        super(ImageLoader, self).__init__()
+        self.prefetcher = prefetcher
+        self.generation = generation
+        self.path = path
+        self.size = size
+        self.smooth = smooth
+        self.signal = signal if signal is not None else prefetcher.loaded
+
+    def run(self):
+        #job was cancelled while it was waiting in the queue
+        if self.generation is not None and self.generation != self.prefetcher.generation:
+            return
+
+        #key is taken before decoding, so a file modified during the decode is not cached under its new mtime
+        key = cache_key(self.path, self.size)
+        image = load_image(self.path, self.size, self.smooth)
+        self.signal.emit(self.generation, self.path, key, image)
+
+
+class Prefetcher(QtCore.QObject):
+    """
+    Decodes and scales the images around the current one in the background and stores them in a PixmapCache, so that
+    navigating only has to swap in an already prepared pixmap.
+
+    Jobs are tagged with a generation number. Calling cancel() bumps the generation, which makes queued jobs return
+    without decoding and causes results of jobs that are already running to be discarded.
+    """
+    loaded = QtCore.Signal(object, object, object, object)
+    source_loaded = QtCore.Signal(object, object, object, object)
+
+    def __init__(self, cache, parent=None, ahead=2, behind=1):
+        """
+        Args:
+            cache (PixmapCache): Cache prepared pixmaps are stored in.
+            ahead: Number of images after the current one to prepare.
+            behind: Number of images before the current one to prepare.
+        """
+        super(Prefetcher, self).__init__(parent)
+        self.cache = cache
+        self.ahead = ahead
+        self.behind = behind
+        self.generation = 0
+        self.size = None #size of the most recently scheduled jobs
+        self.smooth = True #scaling quality passed to load_image
+        self.pending = set() #paths queued or being decoded
+
+        self.pool = QtCore.QThreadPool(self)
+        self.pool.setMaxThreadCount(max(1, min(QtCore.QThread.idealThreadCount(), ahead + behind)))
+        self.loaded.connect(self.on_loaded)
+
+    def cancel(self):
+        """Discard the results of any queued or running jobs."""
+        self.generation += 1
+        self.pending.clear()
+
+    def forget(self, path):
+        """Drop everything prepared for path, e.g. because the file was deleted."""
+        self.cache.discard(path)
+        self.pending.discard(path)
+
+    def load_source(self, path, size):
+        """
+        Decode path scaled to fit size and emit it with source_loaded. Unlike prefetching, the job is not affected by
+        cancel(), since it is used to rescale the current image when the window size changes.
+        """
+        self.pool.start(ImageLoader(self, None, path, size, True, self.source_loaded))
+
+    def schedule(self, paths, i, size):
+        """
+        Prepare the neighbours of index i in paths, scaled to size.
+
+        Args:
+            paths: List of image paths.
+            i: Index of the image currently displayed.
+            size (w,h): Dimensions the images are scaled to.
+        """
+        if size != self.size:
+            #window was resized, jobs still queued would produce pixmaps of the wrong size
+            self.cancel()
+            self.size = size
+
+        n = len(paths)
+        wanted = []
+        for offset in range(1, self.ahead + 1):
+            wanted.append(paths[(i + offset) % n])
+        for offset in range(1, self.behind + 1):
+            wanted.append(paths[(i - offset) % n])
+
+        for path in wanted:
+            if path not in self.pending and cache_key(path, size) not in self.cache:
+                self.pending.add(path)
+                #start fetching the file now, the job may wait for a thread while earlier ones decode
+                read_ahead(renditions.lookup(path, size) or path if renditions is not None else path)
+                self.pool.start(ImageLoader(self, self.generation, path, size, self.smooth))
+        profiler.count('prefetch_queue', len(self.pending))
+
+    def on_loaded(self, generation, path, key, image):
+        """Convert a decoded image to a pixmap. Runs on the GUI thread, since pixmaps cannot be created elsewhere."""
+        if generation != self.generation:
+            return
+
+        self.pending.discard(path)
+        if not image.isNull():
+            with profiler.span('fromImage'):
+                pixmap = QPixmap.fromImage(image)
+            self.cache.put(key, pixmap)
+        profiler.count('prefetch_queue', len(self.pending))
+
+
+class SlideScheduler(QtCore.QObject):
+    """
+    Times a playing slideshow. Each slide stays on screen for interval milliseconds, counted from when it was actually
+    shown, so a slide that was slow to prepare does not cut the next one short.
+
+    lead milliseconds before a slide is due, prepare is emitted so the next slide can be made ready in time. If it is
+    still not ready when due, the change is deferred for up to max_defer milliseconds. After that a ready slide up to
+    max_skip places further on is shown instead, or failing that the next slide is shown late.
+
+    The time each slide was on screen is recorded, as a 'slide' span for the profiler and for stats().
+    """
+    prepare = QtCore.Signal() #the next slide is due in lead milliseconds
+    advance = QtCore.Signal(int) #show the slide this many places on
+
+    def __init__(self, is_ready, parent=None, interval=5000, lead=1000, max_defer=500, max_skip=2, history=1000):
+        """
+        Args:
+            is_ready: Function taking a number of places after the current slide, returning whether that slide can be
+                shown without decoding it first.
+            interval: Time (milliseconds) each slide is shown for.
+            lead: Time (milliseconds) before a slide is due that prepare is emitted. At most half the interval is used.
+            max_defer: Longest time (milliseconds) a slide that is not ready is waited for.
+            max_skip: Most slides skipped in favour of one that is ready.
+            history: Number of slides stats() covers.
+        """
+        super(SlideScheduler, self).__init__(parent)
+        self.is_ready = is_ready
+        self.interval = interval
+        self.lead = lead
+        self.max_defer = max_defer
+        self.max_skip = max_skip
+        self.defer_step = 20 #time (milliseconds) between checks while a slide is deferred
+        self.active = False
+        self.path = None #slide on screen
+        self.shown_at = None #time.perf_counter() the slide on screen was shown
+        self.due = None #time.perf_counter() the next slide is due
+        self.preparing = False #the timer is set for the prepare point rather than the due time
+        self.deferring = False #the next slide is due but not ready
+        self.advancing = False #advance was emitted and the slide it asked for is not on screen yet
+        self.durations = deque(maxlen=history) #seconds each slide the scheduler moved on from was on screen
+        self.lateness = deque(maxlen=history) #seconds after its due time each slide the scheduler showed appeared
+        self.deferred = 0 #slides that were waited for
+        self.skipped = 0 #slides passed over because they were not ready
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.on_timeout)
+
+    def start(self, path):
+        """Start timing, with path as the slide on screen."""
+        self.active = True
+        self.advancing = False
+        self.restart(path)
+
+    def stop(self):
+        self.active = False
+        self.advancing = False
+        self.timer.stop()
+
+    def set_interval(self, interval):
+        """Change the interval. The slide on screen keeps the time it has already been shown for."""
+        self.interval = interval
+        if self.active:
+            self.due = self.shown_at + interval / 1000
+            self.wait()
+
+    def shown(self, path):
+        """
+        Tell the scheduler that path has been put on screen, either because of advance or by navigating. Navigating
+        to another slide gives it the full interval.
+        """
+        if not self.active or (path == self.path and not self.advancing):
+            return
+
+        now = time.perf_counter()
+        if self.advancing:
+            self.advancing = False
+            self.durations.append(now - self.shown_at)
+            self.lateness.append(max(0.0, now - self.due))
+            profiler.add_span('slide', self.shown_at, now, {'path': str(self.path)})
+            profiler.count('slide_jitter_ms', round((now - self.shown_at) * 1000 - self.interval, 1))
+        self.restart(path, now)
+
+    def restart(self, path, now=None):
+        """Start the interval of the slide on screen."""
+        self.path = path
+        self.shown_at = now if now is not None else time.perf_counter()
+        self.due = self.shown_at + self.interval / 1000
+        self.deferring = False
+        self.wait()
+
+    def wait(self):
+        """Set the timer for the prepare point, or for the due time if that has passed."""
+        remaining = (self.due - time.perf_counter()) * 1000
+        lead = min(self.lead, self.interval / 2)
+        self.preparing = remaining > lead
+        self.timer.start(max(0, int(remaining - lead if self.preparing else remaining)))
+
+    def on_timeout(self):
+        if not self.active:
+            return
+
+        if self.preparing:
+            self.prepare.emit()
+            self.preparing = False
+            self.timer.start(max(0, int((self.due - time.perf_counter()) * 1000)))
+            return
+
+        if self.is_ready(1):
+            steps = 1
+        elif (time.perf_counter() - self.due) * 1000 < self.max_defer:
+            if not self.deferring:
+                self.deferring = True
+                self.deferred += 1
+                profiler.count('slides_deferred', self.deferred)
+            self.timer.start(self.defer_step)
+            return
+        else:
+            steps = 1
+            for n in range(2, self.max_skip + 2):
+                if self.is_ready(n):
+                    steps = n
+                    self.skipped += n - 1
+                    profiler.count('slides_skipped', self.skipped)
+                    break
+
+        self.advancing = True
+        self.advance.emit(steps)
+        if self.advancing:
+            #nothing was shown, e.g. because the slideshow is down to one image. try again after another interval
+            self.advancing = False
+            self.restart(self.path)
+
+    def stats(self):
+        """
+        Timing of the recent slides the scheduler moved on from.
+
+        Returns:
+            dict: Number of slides, mean, shortest and longest time on screen, jitter (root mean square difference
+                from the interval) and longest delay past the due time, all in milliseconds, plus the number of
+                deferred and skipped slides.
+        """
+        stats = {'slides': len(self.durations), 'interval_ms': self.interval, 'deferred': self.deferred,
+                 'skipped': self.skipped}
+        if self.durations:
+            durations = [d * 1000 for d in self.durations]
+            stats.update({
+                'mean_ms': sum(durations) / len(durations),
+                'min_ms': min(durations),
+                'max_ms': max(durations),
+                'jitter_ms': (sum((d - self.interval) ** 2 for d in durations) / len(durations)) ** 0.5,
+                'max_late_ms': max(self.lateness) * 1000,
+            })
+        return stats
+
+
+def cache_dir():
+    """Directory PySlideshow keeps its caches in, following the XDG base directory spec."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return Path(base) / 'pyslideshow'
+
+
+def save_session(session, path=None):
+    """
+    Write a snapshot of the slideshow, which load_session() can bring back without rescanning. The file is replaced
+    atomically, so a kiosk losing power mid-write keeps the previous snapshot.
+
+    Args:
+        session (dict): Directory, options, playlist and position to save, as built by MainWindow.session().
+        path: Snapshot file. Defaults to session.json in cache_dir().
+    """
+    import json
+
+    if path is None:
+        path = cache_dir() / 'session.json'
+    path = Path(str(path))
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(str(tmp_path), 'w', encoding='utf-8') as f:
+        json.dump(session, f)
+    os.replace(str(tmp_path), str(path))
+
+
+def load_session(path=None):
+    """
+    Returns:
+        dict: The snapshot written by save_session(), or None if there is none or it could not be read.
+    """
+    import json
+
+    if path is None:
+        path = cache_dir() / 'session.json'
+    try:
+        with open(str(path), encoding='utf-8') as f:
+            session = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(session, dict) or not session.get('paths'):
+        return None
+    return session
+
+
+class ImageIndex(object):
+    """
+    Persistent SQLite index of the images PySlideshow has seen, holding each image's size, mtime, format and content
+    hash. Lets a scan of a previously visited directory start from the known
+    contents and only re-read files that changed. Files that turned out not to be readable images are kept too, marked
+    invalid, so they are not checked again until they change.
+
+    sqlite3 connections can only be used by the thread that created them, so each thread opens its own ImageIndex.
+    """
+
+    def __init__(self, db_path=None):
+        """
+        Args:
+            db_path: Database file. Defaults to index.sqlite in cache_dir().
+        """
+        import sqlite3
+
+        if db_path is None:
+            db_path = cache_dir() / 'index.sqlite'
+        Path(str(db_path)).parent.mkdir(parents=True, exist_ok=True)
+
+        self.db = sqlite3.connect(str(db_path), timeout=10)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS images ('
+                        'path TEXT PRIMARY KEY, dir TEXT NOT NULL, size INTEGER, mtime INTEGER)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS images_dir ON images (dir)')
+
+        #the validation columns were added later, rows from indexes without them count as valid
+        columns = {row[1] for row in self.db.execute('PRAGMA table_info(images)')}
+        for column, definition in (('format', 'TEXT'), ('hash', 'TEXT'), ('valid', 'INTEGER NOT NULL DEFAULT 1')):
+            if column not in columns:
+                self.db.execute('ALTER TABLE images ADD COLUMN ' + column + ' ' + definition)
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def lookup(self, image_dir, recursive):
+        """
+        Known images in image_dir.
+
+        Returns:
+            dict: path -> (size, mtime, valid, content hash) for every indexed file in image_dir, and its
+                subdirectories if recursive. The hash is None for entries indexed before files were validated.
+        """
+        image_dir = os.path.normpath(image_dir)
+        query = 'SELECT path, size, mtime, valid, hash FROM images WHERE '
+        if recursive:
+            #every dir starting with image_dir + separator sorts between these two bounds
+            rows = self.db.execute(query + 'dir = ? OR (dir >= ? AND dir < ?)',
+                                   (image_dir, image_dir + os.sep, image_dir + chr(ord(os.sep) + 1)))
+        else:
+            rows = self.db.execute(query + 'dir = ?', (image_dir,))
+        return {path: (size, mtime, bool(valid), content_hash) for path, size, mtime, valid, content_hash in rows}
+
+    def store(self, path, size, mtime, fmt=None, content_hash=None, valid=True):
+        """
+        Add or replace the entry for path. Changes are written by commit().
+
+        Args:
+            fmt: Image format found by sniff_image().
+            content_hash: Content hash from sniff_image().
+            valid: False to record that path is not a readable image.
+        """
+        path = os.path.normpath(str(path))
+        self.db.execute('INSERT OR REPLACE INTO images (path, dir, size, mtime, format, hash, valid) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        (path, os.path.dirname(path), size, mtime, fmt, content_hash, int(valid)))
+
+    def remove(self, paths):
+        """Remove the entries for paths. Changes are written by commit()."""
+        self.db.executemany('DELETE FROM images WHERE path = ?', ((str(p),) for p in paths))
+
+    def commit(self):
+        self.db.commit()
+
+
+class DirectoryScanner(QtCore.QThread):
+    """
+    Walks a directory tree with os.scandir on a background thread and reports the images it finds in batches, so the
+    first image can be shown long before the whole tree has been walked.
+
+    Images known from a previous visit are reported straight from the ImageIndex before the walk starts. The walk then
+    reconciles the index with the filesystem: new images are reported, vanished ones are reported as removed, and only
+    new or modified files are checked again. walked is emitted once every image has been reported, before the index is
+    written, since the slideshow only needs the list of images.
+
+    Files are picked by the suffixes of the formats Qt can read, then checked with sniff_image() on a small thread pool,
+    so misnamed, truncated and non-image files never reach the slideshow. Copies of an image already reported, going by
+    the content hash, are skipped. Both results are kept in the index, so unchanged files are not read again.
+    """
+    found = QtCore.Signal(object) #list of image paths
+    removed = QtCore.Signal(object) #list of image paths that no longer exist
+    progress = QtCore.Signal(int, int) #directories scanned, images found
+    indexing = QtCore.Signal(int, int) #images indexed, images to index
+    walked = QtCore.Signal() #every image has been reported, only indexing is left
+    copies = QtCore.Signal(object) #list of image paths left out as copies of reported images
+
+    def __init__(self, image_dir, recursive, parent=None, batch_size=500, batch_interval=0.1, use_index=True,
+                 validate_threads=4):
+        """
+        Args:
+            image_dir: Directory to scan.
+            recursive: Also scan subdirectories.
+            batch_size: Maximum number of paths reported per batch.
+            batch_interval: Maximum time (seconds) found images are held back before being reported.
+            use_index: Read and update the persistent ImageIndex.
+            validate_threads: Number of threads checking file contents.
+        """
+        super(DirectoryScanner, self).__init__(parent)
+        self.image_dir = image_dir
+        self.recursive = recursive
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.use_index = use_index
+        self.validate_threads = validate_threads
+        self.directories = [] #directories walked so far
+        self.stopped = False
+
+    def stop(self):
+        """Ask the scan to finish early. Batches already emitted are not retracted."""
+        self.stopped = True
+
+    def run(self):
+        import sqlite3
+
+        index = None
+        if self.use_index:
+            try:
+                index = ImageIndex()
+            except (sqlite3.Error, OSError):
+                #scan without the index rather than not at all
+                index = None
+
+        try:
+            self.scan(index)
+        finally:
+            if index is not None:
+                index.close()
+
+    def scan(self, index):
+        from concurrent.futures import ThreadPoolExecutor
+
+        known = index.lookup(self.image_dir, self.recursive) if index is not None else {}
+        hashes = {} #content hash -> path of the image reported with it
+        copies = {} #content hash -> paths left out as copies of the image reported with it
+        reported = set() #paths reported from the index
+        for path, (size, mtime, valid, content_hash) in known.items():
+            if not valid:
+                continue
+            #entries share a current hash only once same_contents() has confirmed they are copies. older hashes are
+            #not trusted, the walk checks those entries again
+            current = content_hash is not None and content_hash.startswith(HASH_PREFIX)
+            if current and hashes.setdefault(content_hash, path) != path:
+                copies.setdefault(content_hash, []).append(path)
+                continue
+            reported.add(path)
+
+        known_paths = [Path(p) for p in sorted(reported)]
+        for start in range(0, len(known_paths), self.batch_size):
+            self.found.emit(known_paths[start:start + self.batch_size])
+
+        batch = []
+        seen = set()
+        pending = [] #(path, size, mtime) of files waiting to be checked
+        checked = [] #(path, size, mtime, sniff_image() result) of files new or modified since they were indexed
+        retracted = [] #reported paths that are no longer images, or have become copies of another image
+        dirs_scanned = 0
+        images_found = len(known_paths)
+        last_emit = time.monotonic()
+        stack = [os.path.normpath(self.image_dir)]
+        suffixes = image_suffixes()
+
+        with ThreadPoolExecutor(max_workers=self.validate_threads) as executor:
+            while stack and not self.stopped:
+                d = stack.pop()
+                try:
+                    entries = os.scandir(d)
+                except OSError:
+                    #unreadable directory, skip it
+                    continue
+                self.directories.append(d)
+
+                with entries:
+                    for entry in entries:
+                        if self.stopped:
+                            break
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if self.recursive and not entry.name.startswith('.Trash'):
+                                    stack.append(entry.path)
+                                continue
+                            elif os.path.splitext(entry.name)[1].lower() not in suffixes or not entry.is_file():
+                                continue
+                            st = entry.stat() if index is not None else None
+                        except OSError:
+                            continue
+
+                        size, mtime = (st.st_size, st.st_mtime_ns) if st is not None else (None, None)
+                        if entry.path in known:
+                            seen.add(entry.path)
+                            record = known[entry.path]
+                            current = not record[2] or (record[3] or '').startswith(HASH_PREFIX)
+                            if record[:2] == (size, mtime) and current:
+                                continue
+                        pending.append((entry.path, size, mtime))
+
+                        #check the very first file on its own, so the first image can be reported straight away
+                        if images_found + len(batch) == 0 or len(pending) >= self.validate_threads * 16:
+                            results, new, gone = self.validate(executor, pending, hashes, copies, reported)
+                            checked.extend(results)
+                            batch.extend(new)
+                            retracted.extend(gone)
+                            pending = []
+
+                        #report the very first image straight away, then in batches
+                        if batch and (images_found == 0 or len(batch) >= self.batch_size or
+                                      time.monotonic() - last_emit >= self.batch_interval):
+                            images_found += len(batch)
+                            self.found.emit(batch)
+                            self.progress.emit(dirs_scanned, images_found)
+                            batch = []
+                            last_emit = time.monotonic()
+
+                dirs_scanned += 1
+
+            if pending and not self.stopped:
+                results, new, gone = self.validate(executor, pending, hashes, copies, reported)
+                checked.extend(results)
+                batch.extend(new)
+                retracted.extend(gone)
+
+        if self.stopped:
+            return
+
+        #an image that has gone or changed must not take its copies with it, the first copy still there is shown
+        #in its place
+        contents = {p: known[p][3] for p in seen if known[p][2]} #path -> content hash of the images found
+        for path, size, mtime, result in checked:
+            contents[path] = result[1] if result is not None else None
+        promoted = set()
+        for content_hash, paths in copies.items():
+            if contents.get(hashes[content_hash]) == content_hash:
+                continue
+            for path in paths:
+                if contents.get(path) == content_hash:
+                    hashes[content_hash] = path
+                    promoted.add(Path(path))
+                    break
+        batch.extend(promoted)
+        retracted = [p for p in retracted if p not in promoted]
+        left_out = [Path(p) for content_hash, paths in copies.items() for p in paths
+                    if contents.get(p) == content_hash and hashes[content_hash] != p]
+
+        if batch:
+            images_found += len(batch)
+            self.found.emit(batch)
+        self.progress.emit(dirs_scanned, images_found)
+
+        missing = [p for p in known if p not in seen]
+        retracted.extend(Path(p) for p in missing if p in reported)
+        if retracted:
+            self.removed.emit(retracted)
+        if left_out:
+            self.copies.emit(left_out)
+        self.walked.emit()
+
+        if index is None:
+            return
+
+        if missing:
+            index.remove(missing)
+            index.commit()
+
+        #written after every image has been reported, so the slideshow does not wait for the database
+        for n, (path, size, mtime, result) in enumerate(checked):
+            if self.stopped:
+                break
+            if result is None:
+                index.store(path, size, mtime, valid=False)
+            else:
+                index.store(path, size, mtime, result[0], result[1])
+            if n % 100 == 99:
+                index.commit()
+                self.indexing.emit(n + 1, len(checked))
+        index.commit()
+
+    def validate(self, executor, pending, hashes, copies, reported):
+        """
+        Check files with sniff_image() and sort out which of them to report.
+
+        Args:
+            executor (concurrent.futures.ThreadPoolExecutor): Pool the files are read on.
+            pending: (path, size, mtime) of the files to check.
+            hashes: dict content hash -> path of the image reported with it. Updated with the new images.
+            copies: dict content hash -> paths left out as copies. Updated with the new copies.
+            reported: Paths that were reported before the walk.
+
+        Returns:
+            (results, new, gone): (path, size, mtime, sniff_image() result) of every pending file, paths of the images
+                to report, and paths reported before that are no longer images or have become copies of another image.
+        """
+        results = []
+        new = []
+        gone = []
+        for (path, size, mtime), result in zip(pending, executor.map(check_image, [p[0] for p in pending])):
+            if result is not None:
+                other = hashes.get(result[1])
+                if other is not None and other != path and not same_contents(path, other):
+                    #different images that happen to match in the sampled blocks. a hash of its own keeps this one
+                    #from being taken for a copy on later scans too
+                    own = hashlib.sha1(path.encode('utf-8', 'surrogateescape')).hexdigest()
+                    result = (result[0], result[1] + ':' + own)
+            results.append((path, size, mtime, result))
+            if result is None or hashes.setdefault(result[1], path) != path:
+                if result is not None:
+                    copies.setdefault(result[1], []).append(path)
+                if path in reported:
+                    gone.append(Path(path))
+            elif path not in reported:
+                new.append(Path(path))
+        return results, new, gone
+
+
+class DirectoryLister(QtCore.QRunnable):
+    """
+    Lists the images and subdirectories of a set of directories for a DirectoryWatcher. Files the watcher does not know
+    yet are checked with sniff_image(), so one that is still being written is left out until it is complete.
+    """
+
+    def __init__(self, watcher, generation, dirs, known):
+        """
+        Args:
+            known: dict dir -> set of names of the images the watcher already knows in it.
+        """
+        super(DirectoryLister, self).__init__()
+        self.watcher = watcher
+        self.generation = generation
+        self.dirs = dirs
+        self.known = known
+
+    def run(self):
+        #dir -> (set of image names, list of subdirectories, dict invalid file name -> (size, mtime)), or None if gone
+        listing = {}
+        suffixes = image_suffixes()
+        for d in self.dirs:
+            known = self.known.get(d, ())
+            names = set()
+            subdirs = []
+            invalid = {}
+            try:
+                with os.scandir(d) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if not entry.name.startswith('.Trash'):
+                                    subdirs.append(entry.path)
+                            elif os.path.splitext(entry.name)[1].lower() in suffixes and entry.is_file():
+                                if entry.name in known or check_image(entry.path) is not None:
+                                    names.add(entry.name)
+                                else:
+                                    st = entry.stat()
+                                    invalid[entry.name] = (st.st_size, st.st_mtime_ns)
+                        except OSError:
+                            continue
+            except OSError:
+                listing[d] = None
+                continue
+            listing[d] = (names, subdirs, invalid)
+
+        self.watcher.listed.emit(self.generation, listing)
+
+
+class DirectoryWatcher(QtCore.QObject):
+    """
+    Watches the slideshow's directories and reports images that are added or removed, so the slideshow can follow a
+    directory that is being written to without rescanning it. A rename is reported as a removal plus an addition.
+
+    Change notifications only say which directory changed. Bursts of them are coalesced: a directory is listed once the
+    notifications for it have paused for debounce milliseconds (or at the latest after max_delay), and the listing is
+    compared with the images already known in that directory. Directories holding files that are not readable images
+    yet, typically because they are still being written, are listed again every retry_delay milliseconds for as long as
+    those files keep changing. Modifications inside a directory do not cause change notifications, so this is how a
+    slow copy that completes later is picked up.
+    """
+    added = QtCore.Signal(object) #list of image paths
+    removed = QtCore.Signal(object) #list of image paths
+    listed = QtCore.Signal(int, object)
+
+    def __init__(self, parent=None, debounce=250, max_delay=2000, retry_delay=2000, max_retries=5):
+        """
+        Args:
+            debounce: Quiet period (milliseconds) to wait for after the last change notification.
+            max_delay: Longest time (milliseconds) changes are held back while notifications keep arriving.
+            retry_delay: Time (milliseconds) before a directory with invalid files is listed again.
+            max_retries: Number of listings in a row an invalid file can stay the same size and mtime before it is
+                given up on.
+        """
+        super(DirectoryWatcher, self).__init__(parent)
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.retry_delay = retry_delay
+        self.max_retries = max_retries
+        self.unready = {} #dir -> {name: (size, mtime, listings it has been unchanged for)} of invalid files
+        self.recursive = False
+        self.generation = 0
+        self.files = {} #dir -> set of names of the images known in it
+        self.dirty = set() #dirs with changes that have not been listed yet
+        self.first_dirty = None #time the oldest unlisted change arrived
+        self.listing = False #a DirectoryLister is running
+
+        self.fs_watcher = QtCore.QFileSystemWatcher(self)
+        self.fs_watcher.directoryChanged.connect(self.on_directory_changed)
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+
+        self.pool = QtCore.QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.listed.connect(self.on_listed)
+
+    def watch(self, image_dir, recursive):
+        """Start watching image_dir instead of whatever was watched before."""
+        self.stop()
+        self.recursive = recursive
+        self.add_dirs([os.path.normpath(image_dir)])
+
+    def stop(self):
+        """Stop watching and forget all known images."""
+        self.generation += 1
+        self.timer.stop()
+        watched = self.fs_watcher.directories()
+        if watched:
+            self.fs_watcher.removePaths(watched)
+        self.files.clear()
+        self.dirty.clear()
+        self.unready.clear()
+        self.first_dirty = None
+        self.listing = False
+
+    def add_dirs(self, dirs):
+        """Watch dirs in addition to the directories already watched."""
+        watched = set(self.fs_watcher.directories())
+        new = [d for d in dirs if d not in watched]
+        if new:
+            self.fs_watcher.addPaths(new)
+
+    def track(self, paths):
+        """
+        Record paths as known images, so they are not reported as added.
+
+        Returns:
+            list: The paths that were not known before.
+        """
+        new = []
+        for path in paths:
+            names = self.files.setdefault(str(path.parent), set())
+            if path.name not in names:
+                names.add(path.name)
+                new.append(path)
+        return new
+
+    def untrack(self, paths):
+        """Forget known images, e.g. because the slideshow deleted them itself."""
+        for path in paths:
+            names = self.files.get(str(path.parent))
+            if names is not None:
+                names.discard(path.name)
+
+    def on_directory_changed(self, path):
+        self.dirty.add(path)
+        now = time.monotonic()
+        if self.first_dirty is None:
+            self.first_dirty = now
+
+        if (now - self.first_dirty) * 1000 < self.max_delay:
+            #restart the quiet period
+            self.timer.start(self.debounce)
+        elif not self.timer.isActive():
+            self.timer.start(0)
+
+    def flush(self):
+        """List the directories that changed, unless a listing is already running."""
+        if self.listing or not self.dirty:
+            #on_listed flushes again once the running listing is done
+            return
+
+        dirs = self.dirty
+        self.dirty = set()
+        self.first_dirty = None
+        self.listing = True
+        known = {d: set(self.files.get(d, ())) for d in dirs}
+        self.pool.start(DirectoryLister(self, self.generation, dirs, known))
+
+    def retry(self, generation, dirs):
+        """List dirs again, unless the watcher was restarted since."""
+        if generation == self.generation:
+            for d in dirs:
+                self.on_directory_changed(d)
+
+    def on_listed(self, generation, listing):
+        """Compare directory listings with the known images and report the differences."""
+        if generation != self.generation:
+            return
+        self.listing = False
+
+        added = []
+        removed = []
+        retry = []
+        for d, result in listing.items():
+            known = self.files.get(d, set())
+
+            if result is None:
+                #directory was removed or renamed, along with everything below it
+                prefix = d + os.sep
+                for gone in [k for k in self.files if k == d or k.startswith(prefix)]:
+                    removed.extend(Path(gone) / name for name in self.files.pop(gone))
+                for gone in [k for k in self.unready if k == d or k.startswith(prefix)]:
+                    del self.unready[gone]
+                watched = [w for w in self.fs_watcher.directories() if w == d or w.startswith(prefix)]
+                if watched:
+                    self.fs_watcher.removePaths(watched)
+                continue
+
+            names, subdirs, invalid = result
+            previous = self.unready.get(d, {})
+            unready = {}
+            for name, (size, mtime) in invalid.items():
+                last = previous.get(name)
+                unchanged = last[2] + 1 if last is not None and last[:2] == (size, mtime) else 0
+                unready[name] = (size, mtime, unchanged)
+            if unready:
+                self.unready[d] = unready
+                #keep listing while any invalid file is still changing, or has only just stopped
+                if any(entry[2] < self.max_retries for entry in unready.values()):
+                    retry.append(d)
+            else:
+                self.unready.pop(d, None)
+
+            added.extend(Path(d) / name for name in names - known)
+            removed.extend(Path(d) / name for name in known - names)
+            self.files[d] = names
+
+            if self.recursive:
+                watched = set(self.fs_watcher.directories())
+                new = [sub for sub in subdirs if sub not in watched]
+                if new:
+                    #list new subdirectories too, they may have been moved in with images already inside
+                    self.add_dirs(new)
+                    self.dirty.update(new)
+
+        if removed:
+            self.removed.emit(removed)
+        if added:
+            self.added.emit(added)
+
+        if self.dirty:
+            self.timer.start(self.debounce)
+        if retry:
+            generation = self.generation
+            QtCore.QTimer.singleShot(self.retry_delay, lambda: self.retry(generation, retry))
+
+
+def trash_dirs(path):
+    """
+    Trash directory a file is moved to when it is deleted, following the freedesktop.org trash specification: the home
+    trash for files on the same device as it, otherwise $topdir/.Trash-$uid on the file's own mount, so deleting never
+    has to copy a file across devices.
+
+    Returns:
+        (files dir, info dir)
+    """
+    data_home = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    trash = os.path.join(data_home, 'Trash')
+
+    if hasattr(os, 'getuid'):
+        #the home trash is created on first use, on the device of the nearest directory of it that exists already
+        existing = os.path.abspath(data_home)
+        while not os.path.isdir(existing) and os.path.dirname(existing) != existing:
+            existing = os.path.dirname(existing)
+        try:
+            home_device = os.stat(existing).st_dev
+        except OSError:
+            home_device = None
+
+        if os.stat(str(path)).st_dev != home_device:
+            top = os.path.dirname(os.path.abspath(str(path)))
+            while not os.path.ismount(top):
+                top = os.path.dirname(top)
+            trash = os.path.join(top, '.Trash-' + str(os.getuid()))
+
+    return os.path.join(trash, 'files'), os.path.join(trash, 'info')
+
+
+def move_to_trash(path):
+    """
+    Move path to the trash, writing the .trashinfo file that lets desktop file managers restore it.
+
+    Returns:
+        str: Where the file was moved to.
+
+    Raises:
+        OSError: The file could not be moved.
+    """
+    from urllib.parse import quote
+
+    path = os.path.abspath(str(path))
+    files_dir, info_dir = trash_dirs(path)
+    os.makedirs(files_dir, exist_ok=True)
+    os.makedirs(info_dir, exist_ok=True)
+
+    #claim a name by creating its info file exclusively, so concurrent deletes of equally named files don't collide
+    base, ext = os.path.splitext(os.path.basename(path))
+    n = 0
+    while True:
+        name = base + ('.' + str(n) if n else '') + ext
+        info_path = os.path.join(info_dir, name + '.trashinfo')
+        try:
+            fd = os.open(info_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            break
+        except FileExistsError:
+            n += 1
+
+    with os.fdopen(fd, 'w') as info:
+        info.write('[Trash Info]\nPath=' + quote(path) + '\nDeletionDate=' +
+                   time.strftime('%Y-%m-%dT%H:%M:%S') + '\n')
+
+    trash_path = os.path.join(files_dir, name)
+    try:
+        os.rename(path, trash_path)
+    except OSError:
+        os.remove(info_path)
+        raise
+    return trash_path
+
+
+def restore_from_trash(path, trash_path):
+    """
+    Move a file that move_to_trash() moved to trash_path back to path.
+
+    Raises:
+        OSError: The file could not be moved back, e.g. because path exists again.
+    """
+    if os.path.lexists(str(path)):
+        raise FileExistsError(errno.EEXIST, 'a file with the same name exists', str(path))
+    os.rename(trash_path, str(path))
+
+    info_path = os.path.join(os.path.dirname(os.path.dirname(trash_path)), 'info',
+                             os.path.basename(trash_path) + '.trashinfo')
+    try:
+        os.remove(info_path)
+    except OSError:
+        pass
+
+
+class DeleteQueue(QtCore.QObject):
+    """
+    Moves deleted images to the trash on a worker thread, so slow storage doesn't hold up the slideshow. Deletions are
+    processed in batches, and the most recent ones can be undone: a deletion still waiting in the queue is simply
+    dropped, one that has been carried out is moved back from the trash, and one that is being carried out is moved back
+    once the move has finished.
+    """
+    restored = QtCore.Signal(object) #path that is back after an undo or a failed delete
+    failed = QtCore.Signal(object, str) #path, error message
+
+    def __init__(self, parent=None, batch_size=100, history=100):
+        """
+        Args:
+            batch_size: Maximum number of files handled per batch.
+            history: Number of recent deletions that can be undone.
+        """
+        super(DeleteQueue, self).__init__(parent)
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        #[path, trash path or None, state], most recent last. the state is 'queued', 'moving' (being moved to the
+        #trash), 'undo' (undone while moving), 'trashed' or 'undone'
+        self.history = deque(maxlen=history)
+        self.queue = queue.Queue()
+
+        self.thread = threading.Thread(target=self.work, name='DeleteQueue')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def delete(self, path):
+        """Queue path to be moved to the trash."""
+        with self.lock:
+            record = [path, None, 'queued']
+            self.history.append(record)
+        self.queue.put(('delete', record))
+
+    def undo(self):
+        """
+        Undo the most recent deletion. restored is emitted with the path once the file is back.
+
+        Returns:
+            bool: False if there was nothing to undo.
+        """
+        with self.lock:
+            if not self.history:
+                return False
+            record = self.history.pop()
+            path, trash_path, state = record
+            if state in ('queued', 'trashed'):
+                record[2] = 'undone'
+            elif state == 'moving':
+                #process() moves it back once it is in the trash
+                record[2] = 'undo'
+
+        if state == 'queued':
+            #not carried out yet, so there is nothing to move back
+            self.restored.emit(path)
+        elif state == 'trashed':
+            self.queue.put(('restore', record))
+        return True
+
+    def close(self):
+        """Finish the queued deletions and stop the worker."""
+        self.queue.put(None)
+        self.thread.join()
+
+    def work(self):
+        while True:
+            ops = [self.queue.get()]
+            #drain whatever else has been queued, up to a batch
+            while len(ops) < self.batch_size:
+                try:
+                    ops.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            with profiler.span('delete_batch', files=len(ops)):
+                for op in ops:
+                    if op is None:
+                        return
+                    self.process(*op)
+
+    def process(self, action, record):
+        path = record[0]
+        if action == 'delete':
+            with self.lock:
+                if record[2] != 'queued':
+                    #undone while it was queued
+                    return
+                record[2] = 'moving'
+            try:
+                trash_path = move_to_trash(path)
+            except OSError as e:
+                with self.lock:
+                    record[2] = 'undone'
+                    if record in self.history:
+                        self.history.remove(record)
+                self.failed.emit(path, e.strerror or str(e))
+                if not isinstance(e, FileNotFoundError):
+                    self.restored.emit(path)
+                return
+
+            with self.lock:
+                record[1] = trash_path
+                undo = record[2] == 'undo'
+                record[2] = 'undone' if undo else 'trashed'
+            if undo:
+                #undone while it was being moved
+                self.queue.put(('restore', record))
+        else:
+            try:
+                restore_from_trash(path, record[1])
+            except OSError as e:
+                self.failed.emit(path, e.strerror or str(e))
+                return
+            self.restored.emit(path)
+
 
-__version__ = '1.0.0'
+class Playlist(object):
+    """
+    Compact ordered list of image paths, for slideshows of millions of images.
+
+    Directory names are interned and file names are stored UTF-8 encoded in a single buffer, so an entry costs a few
+    array slots rather than a Path object. The playback order is a permutation of the entries, which lets shuffle() and
+    unshuffle() reorder the slideshow without rebuilding it. Removed entries are tombstoned in place; a Fenwick tree
+    over the live flags translates between slideshow indices and positions in the permutation in O(log n), and the
+    tombstones are compacted away once they outnumber the live entries.
+
+    Indexing, len() and iteration behave like a list of pathlib.Path objects in playback order.
+    """
+
+    def __init__(self, paths=()):
+        self.dirs = [] #interned directory names
+        self.dir_ids = {} #directory name -> index in dirs
+        self.entry_dir = array('I') #entry -> index in dirs
+        self.name_offsets = array('Q', [0]) #entry -> start of its name in names, plus the end of the last name
+        self.names = bytearray() #UTF-8 file names, back to back
+        self.alive = bytearray() #entry -> 1, or 0 once removed
+        self.order = array('I') #position -> entry, the playback order
+        self.position = array('I') #entry -> position
+        self.tree = array('I', [0]) #Fenwick tree of alive flags by position, 1-based
+        self.lookup = {} #hash of path -> entry, or tuple of entries on a collision
+        self.dead = {} #hash of path -> most recently tombstoned entry, until the next compaction
+        self.live = 0
+
+        for path in paths:
+            self.append(path)
+
+    def __len__(self):
+        return self.live
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.live
+        if not 0 <= i < self.live:
+            raise IndexError('playlist index out of range')
+        return self.path(self.order[self.select(i)])
+
+    def __iter__(self):
+        for entry in self.order:
+            if self.alive[entry]:
+                yield self.path(entry)
+
+    def __contains__(self, path):
+        return self.find(path) >= 0
+
+    def path(self, entry):
+        name = self.names[self.name_offsets[entry]:self.name_offsets[entry + 1]].decode('utf-8', 'surrogateescape')
+        return Path(self.dirs[self.entry_dir[entry]], name)
+
+    def find(self, path):
+        """Entry of path, or -1 if it is not in the playlist."""
+        found = self.lookup.get(hash(str(path)), -1)
+        if isinstance(found, tuple):
+            for entry in found:
+                if self.path(entry) == Path(path):
+                    return entry
+            return -1
+        if found >= 0 and self.path(found) != Path(path):
+            return -1
+        return found
+
+    def index(self, path):
+        """Index of path in the slideshow. Raises ValueError if it is not in the playlist."""
+        entry = self.find(path)
+        if entry < 0:
+            raise ValueError(str(path) + ' is not in the playlist')
+        return self.rank(self.position[entry])
+
+    def append(self, path):
+        """
+        Add path to the end of the slideshow.
+
+        Returns:
+            bool: False if path was already in the playlist, in which case nothing is added.
+        """
+        if self.find(path) >= 0:
+            return False
+
+        path = Path(path)
+        d = str(path.parent)
+        dir_id = self.dir_ids.get(d)
+        if dir_id is None:
+            dir_id = self.dir_ids[d] = len(self.dirs)
+            self.dirs.append(d)
+
+        entry = len(self.entry_dir)
+        self.entry_dir.append(dir_id)
+        self.names += path.name.encode('utf-8', 'surrogateescape')
+        self.name_offsets.append(len(self.names))
+        self.alive.append(1)
+        self.position.append(len(self.order))
+        self.order.append(entry)
+        self.tree_append(1)
+        self.live += 1
+
+        key = hash(str(path))
+        found = self.lookup.get(key)
+        if found is None:
+            self.lookup[key] = entry
+        elif isinstance(found, tuple):
+            self.lookup[key] = found + (entry,)
+        else:
+            self.lookup[key] = (found, entry)
+        return True
+
+    def insert_random(self, path, start):
+        """
+        Add path at a uniformly random index from start to the end of the slideshow. Adding every new path this way
+        keeps the part of the slideshow from start onwards uniformly shuffled.
+
+        Returns:
+            bool: False if path was already in the playlist.
+        """
+        if not self.append(path):
+            return False
+
+        j = randint(min(start, self.live - 1), self.live - 1)
+        if j != self.live - 1:
+            self.swap(self.select(j), len(self.order) - 1)
+        return True
+
+    def insert(self, i, path):
+        """
+        Add path at index i. To keep this O(log n), the path that was at i moves to the end of the slideshow rather
+        than everything after i shifting along.
+
+        Returns:
+            bool: False if path was already in the playlist.
+        """
+        if not self.append(path):
+            return False
+
+        i = min(max(i, 0), self.live - 1)
+        if i != self.live - 1:
+            self.swap(self.select(i), len(self.order) - 1)
+        return True
+
+    def revive(self, path):
+        """
+        Bring back a removed path at the index it had, as if it had never been removed. If it is no longer known, e.g.
+        because the playlist was compacted since, it is added at the end instead.
+
+        Returns:
+            bool: False if path was already in the playlist.
+        """
+        if self.find(path) >= 0:
+            return False
+
+        key = hash(str(path))
+        entry = self.dead.get(key)
+        if entry is None or self.alive[entry] or self.path(entry) != Path(path):
+            return self.append(path)
+
+        del self.dead[key]
+        self.alive[entry] = 1
+        self.tree_add(self.position[entry], 1)
+        self.live += 1
+
+        found = self.lookup.get(key)
+        if found is None:
+            self.lookup[key] = entry
+        elif isinstance(found, tuple):
+            self.lookup[key] = found + (entry,)
+        else:
+            self.lookup[key] = (found, entry)
+        return True
+
+    def pop(self, i):
+        """Remove the path at index i from the slideshow and return it."""
+        if i < 0:
+            i += self.live
+        if not 0 <= i < self.live:
+            raise IndexError('playlist index out of range')
+
+        entry = self.order[self.select(i)]
+        path = self.path(entry)
+        self.tombstone(entry)
+        return path
+
+    def remove(self, path):
+        """
+        Remove path from the slideshow.
+
+        Returns:
+            int: The index path had, or -1 if it was not in the playlist.
+        """
+        entry = self.find(path)
+        if entry < 0:
+            return -1
+
+        i = self.rank(self.position[entry])
+        self.tombstone(entry)
+        return i
+
+    def shuffle(self):
+        """Put the slideshow in a new random order."""
+        self.compact()
+        for p in range(len(self.order) - 1, 0, -1):
+            self.swap(p, randint(0, p))
+
+    def unshuffle(self):
+        """Put the slideshow back in the order the paths were added."""
+        self.compact()
+        self.order = array('I', range(len(self.entry_dir)))
+        self.position = array('I', range(len(self.entry_dir)))
+
+    def swap(self, p, q):
+        """Swap the entries at positions p and q."""
+        a, b = self.order[p], self.order[q]
+        self.order[p], self.order[q] = b, a
+        self.position[a], self.position[b] = q, p
+        if self.alive[a] != self.alive[b]:
+            delta = self.alive[a] - self.alive[b]
+            self.tree_add(p, -delta)
+            self.tree_add(q, delta)
+
+    def tombstone(self, entry):
+        key = hash(str(self.path(entry)))
+        found = self.lookup.pop(key)
+        if isinstance(found, tuple):
+            rest = tuple(e for e in found if e != entry)
+            self.lookup[key] = rest if len(rest) > 1 else rest[0]
+
+        self.alive[entry] = 0
+        self.tree_add(self.position[entry], -1)
+        self.live -= 1
+        self.dead[key] = entry
+
+        #compacting costs O(n), only doing it once the tombstones outnumber the live entries keeps removal O(log n)
+        #amortised
+        if len(self.entry_dir) - self.live > max(self.live, 1024):
+            self.compact()
+
+    def compact(self):
+        """Drop tombstoned entries, keeping the playback order of the live ones."""
+        if self.live == len(self.entry_dir):
+            return
+
+        kept = [entry for entry in range(len(self.entry_dir)) if self.alive[entry]]
+        renumber = {entry: n for n, entry in enumerate(kept)}
+
+        names = bytearray()
+        name_offsets = array('Q', [0])
+        for entry in kept:
+            names += self.names[self.name_offsets[entry]:self.name_offsets[entry + 1]]
+            name_offsets.append(len(names))
+
+        self.entry_dir = array('I', (self.entry_dir[entry] for entry in kept))
+        self.names = names
+        self.name_offsets = name_offsets
+        self.alive = bytearray(b'\x01') * len(kept)
+        self.order = array('I', (renumber[entry] for entry in self.order if entry in renumber))
+        self.position = array('I', [0]) * len(kept)
+        for p, entry in enumerate(self.order):
+            self.position[entry] = p
+
+        self.dead = {}
+        self.lookup = {}
+        for entry in range(len(kept)):
+            key = hash(str(self.path(entry)))
+            found = self.lookup.get(key)
+            if found is None:
+                self.lookup[key] = entry
+            else:
+                self.lookup[key] = (found if isinstance(found, tuple) else (found,)) + (entry,)
+
+        #every position is live, so each node covers exactly its own range
+        self.tree = array('I', (p & -p for p in range(len(kept) + 1)))
+
+    def tree_append(self, value):
+        """Extend the Fenwick tree by one position holding value."""
+        i = len(self.tree)
+        total = value
+        j = i - 1
+        while j > i - (i & -i):
+            total += self.tree[j]
+            j -= j & -j
+        self.tree.append(total)
+
+    def tree_add(self, p, delta):
+        i = p + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def rank(self, p):
+        """Number of live entries before position p, i.e. the index of the entry at p."""
+        total = 0
+        i = p
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def select(self, i):
+        """Position of the live entry with index i."""
+        p = 0
+        step = 1 << (len(self.tree) - 1).bit_length()
+        while step:
+            if p + step < len(self.tree) and self.tree[p + step] <= i:
+                p += step
+                i -= self.tree[p]
+            step >>= 1
+        return p
+
+
+@lru_cache(maxsize=None)
+def resource_icon(name):
+    """QIcon of an image in the compiled resources, built on first use and shared after that."""
+    icon = QIcon()
+    icon.addPixmap(QPixmap(name), QIcon.Normal, QIcon.Off)
+    return icon
 
-from ui_slideshow import Ui_MainWindow
-import qrc_slideshow
 
 class MainWindow(QMainWindow, Ui_MainWindow):
     def __init__(self, parent=None):
@@ -30,19 +2064,93 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.action_exit.triggered.connect(self.close)
         self.action_open.triggered.connect(self.choose_dir)
         self.action_fullscreen.triggered.connect(self.toggle_fullscreen)
+        self.action_smooth.triggered.connect(self.set_smooth_scaling)
+        self.action_watch.triggered.connect(self.set_watching)
+        self.action_overlay.triggered.connect(self.set_overlay_visible)
+        self.action_shuffle.triggered.connect(self.set_shuffle)
+        self.action_undo_delete.triggered.connect(self.undo_delete)
         self.action_speed_fast.triggered.connect(lambda: self.set_slideshow_speed(0))
         self.action_speed_medium.triggered.connect(lambda: self.set_slideshow_speed(1))
         self.action_speed_slow.triggered.connect(lambda: self.set_slideshow_speed(2))
         self.action_speed_custom.triggered.connect(lambda: self.set_slideshow_speed(3))
+        self.action_transition_none.triggered.connect(lambda: self.set_transition(TRANSITION_NONE))
+        self.action_transition_crossfade.triggered.connect(lambda: self.set_transition(TRANSITION_CROSSFADE))
+        self.action_transition_panzoom.triggered.connect(lambda: self.set_transition(TRANSITION_PANZOOM))
 
-        self.image_paths = [] #list of images in the chosen directory
+        self.image_paths = Playlist() #images in the chosen directory, in slideshow order
         self.i = -1 #index of current image in image_paths
         self.is_playing = False #slideshow playing?
         self.is_fullscreen = False #window fullscreen?
+        self.autoplay = False #start the slideshow once the first image is shown?
+        self.autofullscreen = False #go fullscreen once the first image is shown?
+        self.seed = None #seed for a repeatable shuffle order, from the command line
+        self.startup_budget = None #time (milliseconds) the window should be on screen within, or None
+        self.startup_pending = True #the first image since startup has not been shown yet
+        self.save_sessions = False #keep the session snapshot for --restore up to date, set by main()
 
-        #slideshow timer
-        self.timer = QtCore.QTimer(self)
-        self.connect(self.timer, QtCore.SIGNAL("timeout()"), self.next_image)
+        #scaled pixmaps of recently shown and prefetched images
+        self.cache = PixmapCache()
+
+        #decodes neighbouring images in the background
+        self.prefetcher = Prefetcher(self.cache, self)
+
+        #background directory scan, while one is running
+        self.scanner = None
+        self.scan_start = None
+        self.scan_complete = False #every image in image_dir has been found, by a scan or from a session snapshot
+        self.lbl_scan = QLabel(self)
+        self.lbl_scan.hide()
+        self.status_bar.addPermanentWidget(self.lbl_scan)
+
+        #follows changes to the chosen directory while watching is on
+        self.image_dir = None
+        self.scanned_dirs = [] #directories walked by the last complete scan
+        self.copies = [] #images the scan left out as copies, which the watcher must not report as added
+        self.watcher = DirectoryWatcher(self)
+        self.watcher.added.connect(self.add_images)
+        self.watcher.removed.connect(self.remove_images)
+
+        #when shuffling, the first image is picked once the scanner has had one batch interval to find more than the
+        #very first file, which would otherwise always open the slideshow
+        self.first_image_timer = QtCore.QTimer(self)
+        self.first_image_timer.setSingleShot(True)
+        self.first_image_timer.setInterval(100)
+        self.first_image_timer.timeout.connect(self.show_shuffled_first_image)
+
+        #resizing rescales the current image from a decoded copy at screen resolution rather than from the file.
+        #bursts of resize events get a fast preview, the smooth render waits until resizing has paused
+        self.source = None #decoded copy of the current image at screen resolution
+        self.source_path = None #image source belongs to
+        self.source_requested = None #image a decoded copy has been requested for
+        self.resize_pending = False #smooth render is waiting for source
+        self.resize_timer = QtCore.QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(200)
+        self.resize_timer.timeout.connect(self.finish_resize)
+        self.prefetcher.source_loaded.connect(self.on_source_loaded)
+
+        #a pixmap larger than the label must not stop the window from shrinking
+        self.lbl_image.setMinimumSize(1, 1)
+
+        #deleted images are moved to the trash in the background
+        self.deleter = DeleteQueue(self)
+        self.deleter.restored.connect(self.restore_image)
+        self.deleter.failed.connect(self.show_delete_error)
+
+        #performance overlay, drawn over the image while it is turned on
+        self.lbl_overlay = QLabel(self.lbl_image)
+        self.lbl_overlay.setStyleSheet("background-color: rgba(0, 0, 0, 160); color: white; "
+                                       "font-family: monospace; padding: 4px;")
+        self.lbl_overlay.move(0, 0)
+        self.lbl_overlay.hide()
+        self.overlay_timer = QtCore.QTimer(self)
+        self.overlay_timer.setInterval(500)
+        self.overlay_timer.timeout.connect(self.update_overlay)
+
+        #times the slideshow, preparing each slide ahead of when it is due
+        self.scheduler = SlideScheduler(self.slide_ready, self)
+        self.scheduler.prepare.connect(self.prepare_slide)
+        self.scheduler.advance.connect(self.advance_slides)
         self.set_slideshow_speed(1)
 
         #window properties
@@ -61,42 +2169,441 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             self.toggle_slideshow()
         elif e.key() == QtCore.Qt.Key_Delete:
             self.delete_image()
+        elif e.key() == QtCore.Qt.Key_Z and e.modifiers() & QtCore.Qt.ControlModifier:
+            #the menu shortcut does not work while the menubar is hidden in fullscreen
+            self.undo_delete()
         elif e.key() == QtCore.Qt.Key_F11:
             self.toggle_fullscreen()
+        elif e.key() == QtCore.Qt.Key_F12:
+            self.action_overlay.trigger()
         elif e.key() == QtCore.Qt.Key_Escape and self.is_fullscreen:
             self.toggle_fullscreen()
 
+    def resizeEvent(self, e):
+        """Show a quickly scaled preview of the current image, and render it properly once resizing stops."""
+        super(MainWindow, self).resizeEvent(e)
+        if self.i < 0 or len(self.image_paths) == 0:
+            return
+
+        path = self.image_paths[self.i]
+        if self.source_path != path and self.source_requested != path:
+            screen = QApplication.desktop().screenGeometry(self)
+            self.source_requested = path
+            self.prefetcher.load_source(path, (screen.width(), screen.height()))
+
+        lbl_size = (self.lbl_image.width(), self.lbl_image.height())
+        with profiler.span('resize_preview'):
+            if self.source_path == path:
+                preview = QPixmap.fromImage(scale_image(self.source, lbl_size, smooth=False))
+            else:
+                preview = self.lbl_image.current
+                if preview is not None and (preview.width() > lbl_size[0] or preview.height() > lbl_size[1]):
+                    preview = preview.scaled(lbl_size[0], lbl_size[1], QtCore.Qt.KeepAspectRatio,
+                                             QtCore.Qt.FastTransformation)
+            if preview is not None:
+                self.lbl_image.setPixmap(preview, animate=False)
+
+        #restarting the timer coalesces a burst of resize events into one final render
+        self.resize_timer.start()
+
+    def finish_resize(self):
+        """Render the current image at the new label size from its decoded copy, once that is available."""
+        if self.i < 0 or len(self.image_paths) == 0:
+            return
+
+        path = self.image_paths[self.i]
+        if self.source_path != path:
+            #render when the decoded copy arrives
+            self.resize_pending = True
+            return
+
+        self.resize_pending = False
+        lbl_size = (self.lbl_image.width(), self.lbl_image.height())
+        with profiler.span('resize_render'):
+            image = scale_image(self.source, lbl_size, self.action_smooth.isChecked())
+            pixmap = QPixmap.fromImage(image)
+        self.cache.put(cache_key(path, lbl_size), pixmap)
+        self.lbl_image.setPixmap(pixmap, animate=False)
+        self.prefetcher.schedule(self.image_paths, self.i, lbl_size)
+
+    def on_source_loaded(self, generation, path, key, image):
+        """Keep the decoded copy of the current image for rescaling."""
+        if path != self.source_requested:
+            return
+
+        self.source_requested = None
+        if image.isNull():
+            if self.resize_pending:
+                #fall back to decoding at the label size
+                self.resize_pending = False
+                self.update_image()
+            return
+
+        self.source = image
+        self.source_path = path
+        if self.resize_pending:
+            self.finish_resize()
+
+    def closeEvent(self, e):
+        """Stop background work before the window goes away."""
+        if self.scanner is not None:
+            self.scanner.stop()
+            self.scanner.wait()
+        self.prefetcher.cancel()
+        self.prefetcher.pool.waitForDone()
+        self.deleter.close()
+        self.save_session()
+        super(MainWindow, self).closeEvent(e)
+
+    def save_session(self):
+        """Save the slideshow for --restore, if enabled and no scan is still running."""
+        #a partial scan would be restored as if it were the whole directory
+        if self.save_sessions and self.scan_complete and len(self.image_paths) > 0:
+            try:
+                save_session(self.session())
+            except OSError:
+                pass
+
+    def finish_startup(self, directory=None, restore=False):
+        """
+        Do the startup work that can wait until the window is on screen.
+
+        Args:
+            directory: Directory to start a slideshow of.
+            restore: If no directory is given, continue the slideshow saved when the window was last closed.
+        """
+        elapsed = time.perf_counter() - STARTED
+        profiler.add_span('startup_window', STARTED, STARTED + elapsed)
+        if self.startup_budget is not None and elapsed * 1000 > self.startup_budget:
+            sys.stderr.write("Window took %d ms to appear, over the startup budget of %d ms\n" %
+                             (elapsed * 1000, self.startup_budget))
+
+        if directory is not None:
+            self.open_dir(directory)
+        elif restore and not self.restore_session():
+            self.status_bar.showMessage("No slideshow to restore", 3000)
+
+    def session(self):
+        """
+        Returns:
+            dict: Snapshot of the slideshow for save_session(): the directory, whether it was scanned recursively, the
+                directories walked, the images in slideshow order and the index of the current one.
+        """
+        return {
+            'dir': self.image_dir,
+            'recursive': self.action_recursive.isChecked(),
+            'dirs': self.scanned_dirs,
+            'paths': [str(path) for path in self.image_paths],
+            'index': self.i,
+        }
+
+    def restore_session(self):
+        """
+        Continue the slideshow saved when the window was last closed, in the same order and at the same image, without
+        scanning the directory. Changes made to the directory since are only picked up while watching.
+
+        Returns:
+            bool: False if there was no saved slideshow.
+        """
+        session = load_session()
+        if session is None:
+            return False
+
+        if self.scanner is not None:
+            self.scanner.stop()
+            self.scanner = None
+        self.first_image_timer.stop()
+        self.prefetcher.cancel()
+        self.scan_complete = True
+        self.image_dir = session.get('dir')
+        self.scanned_dirs = session.get('dirs') or []
+        self.action_recursive.setChecked(bool(session.get('recursive')))
+        with profiler.span('restore_session', images=len(session['paths'])):
+            self.image_paths = Playlist(Path(p) for p in session['paths'])
+        self.i = -1
+
+        if self.action_watch.isChecked():
+            self.set_watching(True)
+
+        index = session.get('index', 0)
+        self.show_first_image(index if isinstance(index, int) and 0 <= index < len(self.image_paths) else 0)
+        return True
+
     def choose_dir(self):
         """Open file dialog to choose images directory."""
         #todo: show images in folders
         image_dir = QFileDialog.getExistingDirectory(self, self.tr("Choose directory"))
+        if image_dir:
+            self.open_dir(image_dir)
+
+    def open_dir(self, image_dir):
+        """Start a slideshow of the images in image_dir."""
+        #the index and the session snapshot are shared between working directories, so paths must be absolute
+        image_dir = os.path.abspath(image_dir)
+        self.image_dir = image_dir
+        self.scanned_dirs = []
+        self.copies = []
+        self.image_paths = Playlist()
         self.i = -1
+        self.scan_complete = False
+        self.first_image_timer.stop()
+        self.prefetcher.cancel()
+        self.set_navigation_enabled(False)
 
-        if self.action_recursive.isChecked():
-            self.image_paths = [x for x in Path(image_dir).rglob("*") if x.suffix.lower() in ['.jpg', '.png', '.bmp']]
-        else:
-            self.image_paths = [x for x in Path(image_dir).glob("*") if x.suffix.lower() in ['.jpg', '.png', '.bmp']]
+        if self.action_watch.isChecked():
+            self.watcher.watch(image_dir, self.action_recursive.isChecked())
 
-        if len(self.image_paths) > 0:
-            self.btn_next.setEnabled(True)
-            self.btn_prev.setEnabled(True)
-            self.btn_play.setEnabled(True)
-            self.btn_delete.setEnabled(True)
+        #images are added to the slideshow as the scanner finds them
+        if self.scanner is not None:
+            self.scanner.stop()
+        self.scanner = DirectoryScanner(image_dir, self.action_recursive.isChecked(), self)
+        self.scanner.found.connect(self.add_images)
+        self.scanner.removed.connect(self.remove_images)
+        self.scanner.progress.connect(self.show_scan_progress)
+        self.scanner.indexing.connect(self.show_index_progress)
+        self.scanner.walked.connect(self.scan_walked)
+        self.scanner.copies.connect(self.add_copies)
+        self.scanner.finished.connect(self.scan_finished)
+        self.lbl_scan.setText("Scanning...")
+        self.lbl_scan.show()
+        self.scan_start = time.perf_counter()
+        self.scanner.start()
 
-            #shuffle array
-            for i in range(len(self.image_paths) - 1, -1, -1):
-                j = randint(0, i)
-                self.image_paths[i], self.image_paths[j] = self.image_paths[j], self.image_paths[i]
+    def add_images(self, paths):
+        """
+        Add images found by the scanner or the watcher to the slideshow. When shuffling, each image is placed at a
+        random position after the current one, so the images not yet shown stay uniformly shuffled no matter how many
+        batches arrive. Otherwise images are added to the end.
+        """
+        if self.sender() not in (self.scanner, self.watcher):
+            #batch from a scan that has since been replaced
+            return
 
-            self.next_image()
+        if self.action_watch.isChecked():
+            #the scanner and the watcher can both come across an image that was added during the scan, the playlist
+            #ignores paths it already has. a copy the scanner left out before is shown when it takes over from an
+            #image that has gone, so the scanner's paths are not filtered by what the watcher knows
+            new = self.watcher.track(paths)
+            if self.sender() is self.watcher:
+                paths = new
+        if not paths:
+            return
+
+        shuffle = self.action_shuffle.isChecked()
+        for path in paths:
+            if shuffle:
+                self.image_paths.insert_random(path, self.i + 1)
+            else:
+                self.image_paths.append(path)
+
+        if self.i < 0 and len(self.image_paths) > 0:
+            if not shuffle:
+                #first batch, show the first image straight away
+                self.show_first_image(0)
+            elif self.seed is None and not self.first_image_timer.isActive():
+                #with a seed, scan_walked() shows the first image once the order is known
+                self.first_image_timer.start()
         else:
-            self.btn_next.setEnabled(False)
-            self.btn_prev.setEnabled(False)
-            self.btn_play.setEnabled(False)
-            self.btn_delete.setEnabled(False)
+            self.show_status()
+
+    def show_shuffled_first_image(self):
+        """Show the image that has been shuffled to the front while the first batches arrived."""
+        if self.i < 0 and len(self.image_paths) > 0:
+            self.show_first_image(0)
+
+    def show_first_image(self, i):
+        """Show image i of a new slideshow, and apply the command line options that need an image on screen."""
+        self.set_navigation_enabled(True)
+        self.i = i
+        self.update_image()
+
+        if self.startup_pending:
+            self.startup_pending = False
+            profiler.add_span('startup_image', STARTED, time.perf_counter())
+
+        if self.autofullscreen and not self.is_fullscreen:
+            self.action_fullscreen.setChecked(True)
+            self.toggle_fullscreen()
+        if self.autoplay and not self.is_playing:
+            self.toggle_slideshow()
+        self.autofullscreen = self.autoplay = False
+
+    def add_copies(self, paths):
+        """Remember the images the scanner left out as copies, so watching does not add them after all."""
+        if self.sender() is not self.scanner:
+            return
+        self.copies.extend(paths)
+        if self.action_watch.isChecked():
+            self.watcher.track(paths)
+
+    def show_scan_progress(self, dirs_scanned, images_found):
+        """Show how far the directory scan has got in the status bar."""
+        if self.sender() is self.scanner:
+            self.lbl_scan.setText("Scanning... " + str(images_found) + " images in " + str(dirs_scanned) + " folders")
+            profiler.count('scan_images', images_found)
+
+    def show_index_progress(self, indexed, total):
+        """Show how many new or modified images have been added to the index."""
+        if self.sender() is self.scanner:
+            self.lbl_scan.setText("Indexing... " + str(indexed) + " of " + str(total) + " images")
+
+    def remove_images(self, paths):
+        """
+        Remove images that no longer exist from the slideshow, keeping the current image on screen. If the current
+        image itself was removed, the one after it is shown.
+        """
+        if self.sender() not in (self.scanner, self.watcher):
+            return
+
+        if self.action_watch.isChecked():
+            self.watcher.untrack(paths)
 
+        removed = False
+        current_removed = False
+        for path in paths:
+            self.prefetcher.forget(path)
+            i = self.image_paths.remove(path)
+            if i < 0:
+                continue
+
+            removed = True
+            if i < self.i:
+                self.i -= 1
+            elif i == self.i:
+                #the image after it moves up to the current index
+                current_removed = True
+
+        if not removed:
+            return
+
+        if len(self.image_paths) == 0:
+            self.i = -1
+            self.set_navigation_enabled(False)
+            self.lbl_image.clear()
+            self.status_bar.clearMessage()
+        elif self.i >= 0:
+            self.i %= len(self.image_paths)
+            if current_removed:
+                self.update_image()
+            else:
+                self.show_status()
+
+    def scan_walked(self):
+        """Wrap up the scan once the scanner has walked the whole directory, while it goes on indexing."""
+        scanner = self.sender()
+        if scanner is not self.scanner:
+            return
+
+        self.scan_complete = True
+        self.scanned_dirs = scanner.directories
+        self.lbl_scan.setText("Indexing...")
+        profiler.add_span('scan', self.scan_start, time.perf_counter(),
+                          {'dir': scanner.image_dir, 'images': len(self.image_paths)})
+
+        if self.action_watch.isChecked():
+            self.watcher.add_dirs(self.scanned_dirs)
+
+        if self.seed is not None and self.action_shuffle.isChecked() and len(self.image_paths) > 0:
+            self.shuffle_seeded()
+
+        #saved now as well as on closing, so a kiosk that loses power can still restore
+        self.save_session()
+
+        if len(self.image_paths) == 0:
             QMessageBox.information(self, "No Images",
-                                    "No images were found in '" + image_dir + "'. Choose another directory.")
+                                    "No images were found in '" + scanner.image_dir + "'. Choose another directory.")
+
+    def shuffle_seeded(self):
+        """
+        Shuffle the slideshow in the order given by the seed, the same order the headless mode writes. It only depends
+        on the seed and the images found, not on the order they were found in.
+        """
+        current = self.image_paths[self.i] if self.i >= 0 else None
+        random.seed(self.seed)
+        self.image_paths = Playlist(sorted(self.image_paths, key=str))
+        self.image_paths.shuffle()
+        self.prefetcher.cancel()
+
+        if current is None:
+            self.show_first_image(0)
+        else:
+            self.i = self.image_paths.index(current)
+            self.update_image()
+
+    def scan_finished(self):
+        """Tidy up once the scanner has finished indexing, or was stopped."""
+        scanner = self.sender()
+        scanner.deleteLater()
+        if scanner is self.scanner:
+            self.scanner = None
+            self.lbl_scan.hide()
+
+    def set_watching(self, watching):
+        """
+        Turn watching the chosen directory for added, removed and renamed images on or off.
+
+        Args:
+            watching: True to apply changes to the directory to the slideshow as they happen.
+        """
+        if not watching:
+            self.watcher.stop()
+        elif self.image_dir is not None:
+            self.watcher.watch(self.image_dir, self.action_recursive.isChecked())
+            self.watcher.add_dirs(self.scanned_dirs)
+            self.watcher.track(self.image_paths)
+            self.watcher.track(self.copies)
+
+    def set_shuffle(self, shuffle):
+        """
+        Shuffle the slideshow, or put it back in the order the images were found. The current image stays on screen.
+
+        Args:
+            shuffle: True for a new random order, False for the original order.
+        """
+        if len(self.image_paths) == 0:
+            return
+
+        current = self.image_paths[self.i]
+        if shuffle:
+            self.image_paths.shuffle()
+        else:
+            self.image_paths.unshuffle()
+        self.i = self.image_paths.index(current)
+
+        #the prepared neighbours are not the neighbours any more
+        self.prefetcher.cancel()
+        self.update_image()
+
+    def set_overlay_visible(self, visible):
+        """Show or hide the performance overlay."""
+        self.lbl_overlay.setVisible(visible)
+        if visible:
+            self.update_overlay()
+            self.overlay_timer.start()
+        else:
+            self.overlay_timer.stop()
+
+    def update_overlay(self):
+        """Refresh the performance overlay with the latest timings and counters."""
+        lines = profiler.summary()
+        stats = self.scheduler.stats()
+        if stats['slides']:
+            lines.append('%-12s jitter %6.1f ms  late max %6.1f ms  deferred %d  skipped %d' %
+                         ('slideshow', stats['jitter_ms'], stats['max_late_ms'], stats['deferred'], stats['skipped']))
+        self.lbl_overlay.setText("\n".join(lines) or "No measurements yet")
+        self.lbl_overlay.adjustSize()
+
+    def set_navigation_enabled(self, enabled):
+        """Enable or disable the buttons that need images to work with."""
+        self.btn_next.setEnabled(enabled)
+        self.btn_prev.setEnabled(enabled)
+        self.btn_play.setEnabled(enabled)
+        self.btn_delete.setEnabled(enabled)
+
+    def show_status(self):
+        """Show the current image's path and position in the status bar."""
+        self.status_bar.showMessage(
+            str(self.image_paths[self.i]) + "    " + str(self.i + 1) + " of " + str(len(self.image_paths)))
 
     def update_image(self, size=None):
         """
@@ -105,30 +2612,40 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         Args:
             size (w,h): If provided, image scaled to this size. Otherwise, scaled to window size.
         """
-        self.status_bar.showMessage(
-            str(self.image_paths[self.i]) + "    " + str(self.i + 1) + " of " + str(len(self.image_paths) + 1))
-        image = QImage(str(self.image_paths[self.i]))
+        self.show_status()
+        path = self.image_paths[self.i]
 
-        if not image.isNull():
-            if size is None:
-                lbl_size = (self.lbl_image.width(), self.lbl_image.height())
-            else:
-                lbl_size = size
+        if path != self.source_path:
+            #only the current image's decoded copy is kept, and this image is about to be rendered at the label size
+            self.source = None
+            self.source_path = None
+            self.resize_pending = False
+
+        if size is None:
+            lbl_size = (self.lbl_image.width(), self.lbl_image.height())
+        else:
+            lbl_size = size
 
-            img_size = (image.width(), image.height())
-            ratio = (img_size[0] / lbl_size[0], img_size[1] / lbl_size[1])
+        with profiler.span('update_image', path=str(path)):
+            key = cache_key(path, lbl_size)
+            pixmap = self.cache.get(key)
+            if pixmap is None:
+                #not prepared in the background yet, decode it now
+                image = load_image(path, lbl_size, self.action_smooth.isChecked())
+                if not image.isNull():
+                    with profiler.span('fromImage'):
+                        pixmap = QPixmap.fromImage(image)
+                    self.cache.put(key, pixmap)
 
-            #if image width is greater than the label's and image is wider than tall
-            if ratio[0] > 1 and ratio[0] > ratio[1]:
-                #scale image to label's width
-                image = image.scaledToWidth(lbl_size[0], QtCore.Qt.SmoothTransformation)
+            if pixmap is not None:
+                self.lbl_image.setPixmap(pixmap)
 
-            #if height greater and image is taller than it is wide
-            elif ratio[1] > 1 and ratio[1] > ratio[0]:
-                #scale to label's height
-                image = image.scaledToHeight(lbl_size[1], QtCore.Qt.SmoothTransformation)
+            self.prefetcher.schedule(self.image_paths, self.i, lbl_size)
 
-            self.lbl_image.setPixmap(QPixmap.fromImage(image))
+        profiler.count('cache_hits', self.cache.hits)
+        profiler.count('cache_misses', self.cache.misses)
+        profiler.count('cache_bytes', self.cache.bytes)
+        self.scheduler.shown(path)
 
     def prev_image(self):
         """Display previous image."""
@@ -138,33 +2655,78 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
     def next_image(self):
         """Display next image."""
+        self.advance_slides(1)
+
+    def advance_slides(self, steps):
+        """Display the image steps places after the current one."""
         if len(self.image_paths) > 1:
-            self.i = (self.i + 1) % len(self.image_paths)
+            self.i = (self.i + steps) % len(self.image_paths)
             self.update_image()
 
+    def slide_ready(self, steps):
+        """Whether the image steps places after the current one is prepared at the label size."""
+        if len(self.image_paths) < 2:
+            return True
+        path = self.image_paths[(self.i + steps) % len(self.image_paths)]
+        return cache_key(path, (self.lbl_image.width(), self.lbl_image.height())) in self.cache
+
+    def prepare_slide(self):
+        """Queue the next images again, in case they were evicted from the cache or their jobs were cancelled."""
+        if len(self.image_paths) > 1:
+            self.prefetcher.schedule(self.image_paths, self.i, (self.lbl_image.width(), self.lbl_image.height()))
+
     def delete_image(self):
-        """Delete current image from filesystem."""
+        """
+        Delete current image from filesystem. The image leaves the slideshow straight away, while moving it to the
+        trash happens in the background.
+        """
         if len(self.image_paths) > 0:
-            Path.unlink(self.image_paths[self.i])
-            self.image_paths.pop(self.i)
-            self.i -= 1
-            self.next_image()
+            path = self.image_paths.pop(self.i)
+            self.watcher.untrack([path])
+            self.prefetcher.forget(path)
+            self.deleter.delete(path)
+
+            if len(self.image_paths) == 0:
+                self.i = -1
+                self.set_navigation_enabled(False)
+                self.lbl_image.clear()
+                self.status_bar.clearMessage()
+            else:
+                #the next image has moved up to the current index
+                self.i %= len(self.image_paths)
+                self.update_image()
+
+    def undo_delete(self):
+        """Bring back the most recently deleted image."""
+        if not self.deleter.undo():
+            self.status_bar.showMessage("Nothing to undo", 3000)
+
+    def restore_image(self, path):
+        """Put an image whose deletion was undone or failed back into the slideshow, and show it."""
+        if self.action_watch.isChecked():
+            self.watcher.track([path])
+
+        #back at the index it had, so neither it nor the images around it move
+        self.image_paths.revive(path)
+        self.i = self.image_paths.index(path)
+        self.set_navigation_enabled(True)
+        self.update_image()
+
+    def show_delete_error(self, path, message):
+        """Report an image that could not be deleted or restored."""
+        self.status_bar.showMessage("Could not move '" + str(path) + "': " + message, 10000)
 
 
     def toggle_slideshow(self):
         """Play or pauses the slideshow."""
-        icon = QIcon()
-        icon.addPixmap(QPixmap(":/icons/images/media-playback-start.png"), QIcon.Normal, QIcon.Off)
         if self.is_playing:
-            icon.addPixmap(QPixmap(":/icons/images/media-playback-start.png"), QIcon.Normal, QIcon.Off)
-            self.btn_play.setIcon(icon)
+            self.btn_play.setIcon(resource_icon(":/icons/images/media-playback-start.png"))
             self.is_playing = False
-            self.timer.stop()
+            self.scheduler.stop()
         else:
-            icon.addPixmap(QPixmap(":/icons/images/media-playback-pause.png"), QIcon.Normal, QIcon.Off)
-            self.btn_play.setIcon(icon)
+            self.btn_play.setIcon(resource_icon(":/icons/images/media-playback-pause.png"))
             self.is_playing = True
-            self.timer.start()
+            self.scheduler.start(self.image_paths[self.i] if self.i >= 0 else None)
 
 
     def toggle_fullscreen(self):
@@ -214,6 +2776,20 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.btn_delete.setFlat(self.is_fullscreen)
 
 
+    def set_smooth_scaling(self, smooth):
+        """
+        Choose between smooth and fast scaling of images. Everything prepared with the previous setting is discarded.
+
+        Args:
+            smooth: True for smooth (slower, better quality) scaling, False for fast scaling.
+        """
+        self.prefetcher.cancel()
+        self.prefetcher.smooth = smooth
+        self.cache.clear()
+
+        if self.i >= 0 and len(self.image_paths) > 0:
+            self.update_image()
+
     def set_slideshow_speed(self, speed):
         """
         Set the interval between each image based on 'speed'
@@ -233,16 +2809,335 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.action_speed_custom.setChecked(speed >= 3)
 
         if 0 <= speed < 3:
-            self.timer.setInterval(intervals[speed])
+            self.scheduler.set_interval(intervals[speed])
         else:
             custom_speed, ok = QInputDialog.getInt(self, 'Custom Speed', 'Enter slideshow speed (1-60 seconds):',
                                                    1, 1, 60)
             custom_speed *= 1000 #convert to seconds
             if ok:
-                self.timer.setInterval(custom_speed)
+                self.scheduler.set_interval(custom_speed)
+
+    def set_slideshow_interval(self, interval):
+        """
+        Set the interval between each image to any length, as from the command line.
+
+        Args:
+            interval: Milliseconds each image is shown for.
+        """
+        intervals = {2000: 0, 5000: 1, 10000: 2}
+        speed = intervals.get(interval, 3)
+        self.action_speed_fast.setChecked(speed == 0)
+        self.action_speed_medium.setChecked(speed == 1)
+        self.action_speed_slow.setChecked(speed == 2)
+        self.action_speed_custom.setChecked(speed == 3)
+        self.scheduler.set_interval(interval)
+
+    def set_transition(self, transition):
+        """
+        Set the animation used when moving from one image to the next.
+
+        Args:
+            transition: TRANSITION_NONE, TRANSITION_CROSSFADE or TRANSITION_PANZOOM
+        """
+        #check the appropriate menu item
+        self.action_transition_none.setChecked(transition == TRANSITION_NONE)
+        self.action_transition_crossfade.setChecked(transition == TRANSITION_CROSSFADE)
+        self.action_transition_panzoom.setChecked(transition == TRANSITION_PANZOOM)
+
+        self.lbl_image.set_transition(transition)
+
+
+def scan_images(image_dir, recursive):
+    """
+    Scan image_dir with DirectoryScanner on the calling thread, for use without a window.
+
+    Returns:
+        list: Paths of the images found.
+    """
+    paths = []
+    scanner = DirectoryScanner(image_dir, recursive, use_index=False)
+    scanner.found.connect(paths.extend)
+    scanner.run()
+    return paths
+
+
+def init_worker():
+    """Set up a batch worker process. Qt's image format plugins need an application object to be found."""
+    if QtCore.QCoreApplication.instance() is None:
+        init_worker.app = QtCore.QCoreApplication([])
+
+
+def render_thumbnail(path, size):
+    """
+    Batch worker: decode path scaled to fit size.
+
+    Returns:
+        bytes: The thumbnail as PNG, or None if the file could not be decoded.
+    """
+    image = load_image(path, size)
+    if image.isNull():
+        return None
+
+    data = QtCore.QByteArray()
+    buf = QtCore.QBuffer(data)
+    buf.open(QtCore.QIODevice.WriteOnly)
+    image.save(buf, 'PNG')
+    buf.close()
+    return bytes(data)
+
+
+def write_rendition(path, out_path, size, quality=90):
+    """
+    Batch worker: write a copy of path scaled to fit size to out_path. The format is taken from out_path's suffix.
+
+    Returns:
+        bool: True if the rendition was written.
+    """
+    image = load_image(path, size)
+    if image.isNull():
+        return False
+
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    #write to a temporary name first, so a reader never sees a half written rendition
+    tmp_path = out_path + '.part'
+    if not image.save(tmp_path, os.path.splitext(out_path)[1][1:].upper(), quality):
+        return False
+    os.replace(tmp_path, out_path)
+    return True
+
+
+def write_playlist(paths, out_path):
+    """Write paths to out_path as an M3U playlist."""
+    with open(out_path, 'w', encoding='utf-8') as f:
+        f.write('#EXTM3U\n')
+        for path in paths:
+            f.write(str(path) + '\n')
+
+
+def write_contact_sheets(paths, out_path, columns, rows, thumb_size, executor):
+    """
+    Render paths as a grid of thumbnails, columns by rows to a sheet. When there are more images than fit on one sheet,
+    the sheets are numbered, e.g. sheet-001.jpg, sheet-002.jpg.
+
+    Args:
+        paths: Images to include.
+        out_path: Sheet file name. Its suffix selects the format.
+        columns, rows: Thumbnails per row and column.
+        thumb_size: Size of the square cell each thumbnail is fitted into.
+        executor (concurrent.futures.Executor): Pool thumbnails are rendered on.
+
+    Returns:
+        list: Paths of the sheets written.
+    """
+    per_sheet = columns * rows
+    sheet_count = max(1, -(-len(paths) // per_sheet))
+    base, ext = os.path.splitext(out_path)
+    fmt = ext[1:].upper() or 'PNG'
+
+    thumbnails = executor.map(render_thumbnail, [str(p) for p in paths], [(thumb_size, thumb_size)] * len(paths),
+                              chunksize=16)
+
+    written = []
+    for sheet in range(sheet_count):
+        count = min(per_sheet, len(paths) - sheet * per_sheet)
+        used_rows = max(1, -(-count // columns))
+        image = QImage(columns * thumb_size, used_rows * thumb_size, QImage.Format_RGB32)
+        image.fill(0)
+
+        painter = QPainter(image)
+        for n in range(count):
+            data = next(thumbnails)
+            if data is None:
+                continue
+            thumb = QImage.fromData(data, 'PNG')
+            x = (n % columns) * thumb_size + (thumb_size - thumb.width()) // 2
+            y = (n // columns) * thumb_size + (thumb_size - thumb.height()) // 2
+            painter.drawImage(x, y, thumb)
+        painter.end()
+
+        sheet_path = out_path if sheet_count == 1 else base + '-%03d' % (sheet + 1) + ext
+        image.save(sheet_path, fmt, 90)
+        written.append(sheet_path)
+
+    return written
+
+
+def run_headless(args):
+    """
+    Carry out the batch tasks requested on the command line, using every CPU core.
+
+    Returns:
+        int: Exit status.
+    """
+    if args.directory is None:
+        print("A directory is required in headless mode.", file=sys.stderr)
+        return 2
+
+    #QCoreApplication rather than QApplication, no display is needed
+    app = QtCore.QCoreApplication(sys.argv[:1])
+
+    args.directory = os.path.abspath(args.directory)
+    with profiler.span('scan', dir=args.directory):
+        found = scan_images(args.directory, args.recursive)
+    if args.seed is not None:
+        #the shuffle order then only depends on the seed and the images, as in MainWindow.shuffle_seeded()
+        found.sort(key=str)
+    playlist = Playlist(found)
+    if not args.no_shuffle:
+        playlist.shuffle()
+    paths = list(playlist)
+    print("Found " + str(len(paths)) + " images in '" + args.directory + "'")
+
+    if args.playlist:
+        write_playlist(paths, args.playlist)
+        print("Wrote playlist " + args.playlist)
+
+    if not (args.contact_sheet or args.make_renditions):
+        return 0
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=args.jobs, initializer=init_worker) as executor:
+        if args.contact_sheet:
+            with profiler.span('contact_sheets'):
+                sheets = write_contact_sheets(paths, args.contact_sheet, args.columns, args.rows, args.thumb_size,
+                                              executor)
+            print("Wrote " + str(len(sheets)) + " contact sheet(s)")
+
+        if args.make_renditions:
+            store = RenditionStore(args.renditions)
+            #only sources without an up to date rendition, so the store can be refreshed incrementally
+            todo = []
+            for p in paths:
+                try:
+                    out_path = store.rendition_path(p, args.size)
+                except OSError:
+                    continue
+                if not os.path.exists(out_path):
+                    todo.append((str(p), out_path))
+
+            with profiler.span('renditions'):
+                results = executor.map(write_rendition, [t[0] for t in todo], [t[1] for t in todo],
+                                       [args.size] * len(todo), chunksize=4)
+                written = sum(1 for ok in results if ok)
+            print("Wrote " + str(written) + " renditions to " + args.renditions + ", " +
+                  str(len(paths) - len(todo)) + " were up to date")
+
+    return 0
+
+
+def parse_size(text):
+    """Parse a WxH size argument."""
+    try:
+        w, h = (int(x) for x in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected WIDTHxHEIGHT, e.g. 1920x1080")
+    if w <= 0 or h <= 0:
+        raise argparse.ArgumentTypeError("width and height must be positive")
+    return w, h
+
+
+def positive_int(text):
+    """Parse an integer argument that must be greater than zero."""
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected a whole number, got '" + text + "'")
+    if value <= 0:
+        raise argparse.ArgumentTypeError("must be greater than zero")
+    return value
+
+
+def positive_float(text):
+    """Parse a finite number argument that must be greater than zero."""
+    try:
+        value = float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected a number, got '" + text + "'")
+    if not 0 < value < float('inf'):
+        raise argparse.ArgumentTypeError("must be a finite number greater than zero")
+    return value
+
+
+def parse_args(argv):
+    """Parse the command line. Arguments not recognised here are left for Qt."""
+    parser = argparse.ArgumentParser(description="A simple image slideshow viewer.")
+    parser.add_argument('directory', nargs='?', help="directory to show, instead of choosing one in the window")
+    parser.add_argument('-r', '--recursive', action='store_true', help="include subfolders")
+    parser.add_argument('--seed', type=int, help="seed for the shuffle order, to make it repeatable")
+    parser.add_argument('--no-shuffle', action='store_true', help="show images in the order they are found")
+    parser.add_argument('--interval', type=positive_float, metavar='SECONDS', help="time each image is shown for")
+    parser.add_argument('--play', action='store_true', help="start the slideshow once the first image is shown")
+    parser.add_argument('--fullscreen', action='store_true', help="go fullscreen once the first image is shown")
+    parser.add_argument('--restore', action='store_true',
+                        help="without a directory, continue the slideshow from when the window was last closed, "
+                             "without rescanning")
+    parser.add_argument('--startup-budget', type=positive_int, default=1000, metavar='MS',
+                        help="warn when the window takes longer than MS milliseconds to appear (default: 1000)")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="record timings and write them to FILE on exit, as Chrome trace JSON or, if FILE ends "
+                             "in .jsonl, as one JSON event per line")
+
+    headless = parser.add_argument_group("headless mode",
+                                         "Giving --playlist, --contact-sheet or --make-renditions processes the "
+                                         "directory without opening a window. The other options here only adjust "
+                                         "those tasks.")
+    headless.add_argument('--playlist', metavar='FILE', help="write the slideshow order to FILE as an M3U playlist")
+    headless.add_argument('--contact-sheet', metavar='FILE',
+                          help="render thumbnails of all images to FILE, numbered when more than one sheet is needed")
+    headless.add_argument('--columns', type=positive_int, default=8, help="thumbnails per contact sheet row (default: 8)")
+    headless.add_argument('--rows', type=positive_int, default=8, help="thumbnail rows per contact sheet (default: 8)")
+    headless.add_argument('--thumb-size', type=positive_int, default=256, help="contact sheet cell size (default: 256)")
+    parser.add_argument('--renditions', metavar='DIR',
+                        help="rendition store to read images from when it has a copy at a suitable size")
+    headless.add_argument('--make-renditions', action='store_true',
+                          help="add copies of the images scaled to --size to the --renditions store")
+    headless.add_argument('--size', type=parse_size, default=(1920, 1080),
+                          help="display size for --make-renditions, WxH (default: 1920x1080)")
+    headless.add_argument('--jobs', type=positive_int, help="worker processes (default: number of CPUs)")
+
+    args, qt_args = parser.parse_known_args(argv[1:])
+    args.headless = bool(args.playlist or args.contact_sheet or args.make_renditions)
+    if args.make_renditions and not args.renditions:
+        parser.error("--make-renditions requires --renditions")
+    return args, qt_args
+
+
+def main(argv):
+    args, qt_args = parse_args(argv)
+    profiler.recording = args.trace is not None
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    global renditions
+    if args.renditions and not args.make_renditions:
+        renditions = RenditionStore(args.renditions)
+
+    if args.headless:
+        status = run_headless(args)
+    else:
+        app = QApplication(argv[:1] + qt_args)
+        frame = MainWindow()
+        if args.no_shuffle:
+            frame.action_shuffle.setChecked(False)
+        if args.recursive:
+            frame.action_recursive.setChecked(True)
+        if args.interval is not None:
+            frame.set_slideshow_interval(max(1, int(round(args.interval * 1000))))
+        frame.autoplay = args.play
+        frame.autofullscreen = args.fullscreen
+        frame.startup_budget = args.startup_budget
+        frame.seed = args.seed
+        frame.save_sessions = True
+        frame.show()
+        #everything else waits until the window has been painted
+        QtCore.QTimer.singleShot(0, lambda: frame.finish_startup(args.directory, args.restore))
+        status = app.exec_()
+
+    if args.trace:
+        profiler.write_trace(args.trace)
+    return status
+
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
-    frame = MainWindow()
-    frame.show()
-    app.exec_()
\ No newline at end of file
+    sys.exit(main(sys.argv))
@@ -0,0 +1,119 @@
+"""
+Image display widget for PySlideshow, with animated transitions between slides.
+"""
+from PySide import QtCore
+from PySide.QtGui import QLabel, QPainter, QTransform
+
+TRANSITION_NONE = 0
+TRANSITION_CROSSFADE = 1
+TRANSITION_PANZOOM = 2
+
+
+class SlideLabel(QLabel):
+    """
+    QLabel that can animate the change from one pixmap to the next.
+
+    Both slides are drawn from pixmaps that are already scaled to fit the label, so a frame only blends and transforms
+    two pixmaps; nothing is decoded or rescaled while a transition runs. Progress is taken from a clock rather than
+    counted in frames, so a slow frame makes the animation skip ahead instead of run long.
+    """
+
+    def __init__(self, parent=None, fps=60):
+        """
+        Args:
+            fps: Frame rate transitions are drawn at.
+        """
+        super(SlideLabel, self).__init__(parent)
+        self.transition = TRANSITION_NONE
+        self.duration = 500 #length of a transition (milliseconds)
+        self.zoom = 0.08 #how far the incoming slide is zoomed in at the start of a pan and zoom
+        self.current = None #pixmap on screen, kept because QLabel.pixmap() is not valid after setPixmap()
+        self.previous = None #pixmap being transitioned away from
+        self.progress = 1.0 #0 at the start of a transition, 1 once it is done
+
+        self.clock = QtCore.QElapsedTimer()
+        self.frame_timer = QtCore.QTimer(self)
+        self.frame_timer.setInterval(int(1000 / fps))
+        self.frame_timer.timeout.connect(self.next_frame)
+
+    def set_transition(self, transition, duration=None):
+        """
+        Args:
+            transition: TRANSITION_NONE, TRANSITION_CROSSFADE or TRANSITION_PANZOOM.
+            duration: Length of a transition in milliseconds, or None to keep the current length.
+        """
+        self.transition = transition
+        if duration is not None:
+            self.duration = duration
+        if transition == TRANSITION_NONE:
+            self.stop_transition()
+
+    def setPixmap(self, pixmap, animate=True):
+        """
+        Args:
+            pixmap (QPixmap): Slide to show.
+            animate: Use the current transition. Pass False when pixmap is a rescaled version of the same slide.
+        """
+        previous = self.current
+        animate = (animate and self.transition != TRANSITION_NONE and self.isVisible() and previous is not None and
+                   previous.cacheKey() != pixmap.cacheKey())
+
+        self.current = pixmap
+        super(SlideLabel, self).setPixmap(pixmap)
+
+        if animate:
+            #a transition that is still running is cut short, the new one starts from the slide that was coming in
+            self.previous = previous
+            self.progress = 0.0
+            self.clock.start()
+            self.frame_timer.start()
+        else:
+            self.stop_transition()
+
+    def clear(self):
+        self.current = None
+        self.stop_transition()
+        super(SlideLabel, self).clear()
+
+    def stop_transition(self):
+        self.frame_timer.stop()
+        self.previous = None
+        self.progress = 1.0
+        self.update()
+
+    def next_frame(self):
+        self.progress = min(1.0, self.clock.elapsed() / self.duration) if self.duration > 0 else 1.0
+        if self.progress >= 1.0:
+            self.stop_transition()
+        else:
+            self.update()
+
+    def centered(self, pixmap):
+        """Top left corner that centres pixmap in the label."""
+        return QtCore.QPointF((self.width() - pixmap.width()) / 2, (self.height() - pixmap.height()) / 2)
+
+    def paintEvent(self, e):
+        if self.previous is None:
+            super(SlideLabel, self).paintEvent(e)
+            return
+
+        #ease in and out, so the motion starts and stops gently
+        t = self.progress * self.progress * (3 - 2 * self.progress)
+        current = self.current
+
+        painter = QPainter(self)
+        painter.setOpacity(1.0 - t)
+        painter.drawPixmap(self.centered(self.previous), self.previous)
+
+        painter.setOpacity(t)
+        if self.transition == TRANSITION_PANZOOM:
+            #zoom out towards the final size while drifting into place, around the centre of the label
+            scale = 1.0 + self.zoom * (1.0 - t)
+            drift = self.zoom * (1.0 - t) * current.width() / 4
+            transform = QTransform()
+            transform.translate(self.width() / 2 - drift, self.height() / 2)
+            transform.scale(scale, scale)
+            transform.translate(-self.width() / 2, -self.height() / 2)
+            painter.setTransform(transform)
+        painter.drawPixmap(self.centered(current), current)
+        painter.end()
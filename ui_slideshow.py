@@ -25,7 +25,7 @@ class Ui_MainWindow(object):
         self.gridLayout = QtGui.QGridLayout(self.centralwidget)
         self.gridLayout.setContentsMargins(5, -1, 5, 0)
         self.gridLayout.setObjectName("gridLayout")
-        self.lbl_image = QtGui.QLabel(self.centralwidget)
+        self.lbl_image = SlideLabel(self.centralwidget)
         self.lbl_image.setText("")
         self.lbl_image.setScaledContents(False)
         self.lbl_image.setAlignment(QtCore.Qt.AlignCenter)
@@ -103,6 +103,8 @@ class Ui_MainWindow(object):
         self.menuOption.setObjectName("menuOption")
         self.menuSlideshow_speed = QtGui.QMenu(self.menuOption)
         self.menuSlideshow_speed.setObjectName("menuSlideshow_speed")
+        self.menuTransition = QtGui.QMenu(self.menuOption)
+        self.menuTransition.setObjectName("menuTransition")
         self.menuAbout = QtGui.QMenu(self.menubar)
         self.menuAbout.setObjectName("menuAbout")
         MainWindow.setMenuBar(self.menubar)
@@ -135,16 +137,51 @@ class Ui_MainWindow(object):
         self.action_fullscreen = QtGui.QAction(MainWindow)
         self.action_fullscreen.setCheckable(True)
         self.action_fullscreen.setObjectName("action_fullscreen")
+        self.action_smooth = QtGui.QAction(MainWindow)
+        self.action_smooth.setCheckable(True)
+        self.action_smooth.setChecked(True)
+        self.action_smooth.setObjectName("action_smooth")
+        self.action_watch = QtGui.QAction(MainWindow)
+        self.action_watch.setCheckable(True)
+        self.action_watch.setObjectName("action_watch")
+        self.action_overlay = QtGui.QAction(MainWindow)
+        self.action_overlay.setCheckable(True)
+        self.action_overlay.setObjectName("action_overlay")
+        self.action_shuffle = QtGui.QAction(MainWindow)
+        self.action_shuffle.setCheckable(True)
+        self.action_shuffle.setChecked(True)
+        self.action_shuffle.setObjectName("action_shuffle")
+        self.action_undo_delete = QtGui.QAction(MainWindow)
+        self.action_undo_delete.setObjectName("action_undo_delete")
+        self.action_transition_none = QtGui.QAction(MainWindow)
+        self.action_transition_none.setCheckable(True)
+        self.action_transition_none.setChecked(True)
+        self.action_transition_none.setObjectName("action_transition_none")
+        self.action_transition_crossfade = QtGui.QAction(MainWindow)
+        self.action_transition_crossfade.setCheckable(True)
+        self.action_transition_crossfade.setObjectName("action_transition_crossfade")
+        self.action_transition_panzoom = QtGui.QAction(MainWindow)
+        self.action_transition_panzoom.setCheckable(True)
+        self.action_transition_panzoom.setObjectName("action_transition_panzoom")
         self.menuFile.addAction(self.action_open)
+        self.menuFile.addAction(self.action_undo_delete)
         self.menuFile.addSeparator()
         self.menuFile.addAction(self.action_exit)
         self.menuSlideshow_speed.addAction(self.action_speed_slow)
         self.menuSlideshow_speed.addAction(self.action_speed_medium)
         self.menuSlideshow_speed.addAction(self.action_speed_fast)
         self.menuSlideshow_speed.addAction(self.action_speed_custom)
+        self.menuTransition.addAction(self.action_transition_none)
+        self.menuTransition.addAction(self.action_transition_crossfade)
+        self.menuTransition.addAction(self.action_transition_panzoom)
         self.menuOption.addAction(self.action_recursive)
+        self.menuOption.addAction(self.action_watch)
+        self.menuOption.addAction(self.action_shuffle)
         self.menuOption.addAction(self.action_fullscreen)
+        self.menuOption.addAction(self.action_smooth)
+        self.menuOption.addAction(self.action_overlay)
         self.menuOption.addAction(self.menuSlideshow_speed.menuAction())
+        self.menuOption.addAction(self.menuTransition.menuAction())
         self.menuAbout.addAction(self.action_about_slideshow)
         self.menuAbout.addAction(self.action_about_pyside)
         self.menubar.addAction(self.menuFile.menuAction())
@@ -166,6 +203,7 @@ class Ui_MainWindow(object):
         self.menuFile.setTitle(QtGui.QApplication.translate("MainWindow", "File", None, QtGui.QApplication.UnicodeUTF8))
         self.menuOption.setTitle(QtGui.QApplication.translate("MainWindow", "Options", None, QtGui.QApplication.UnicodeUTF8))
         self.menuSlideshow_speed.setTitle(QtGui.QApplication.translate("MainWindow", "Slideshow speed", None, QtGui.QApplication.UnicodeUTF8))
+        self.menuTransition.setTitle(QtGui.QApplication.translate("MainWindow", "Transition", None, QtGui.QApplication.UnicodeUTF8))
         self.menuAbout.setTitle(QtGui.QApplication.translate("MainWindow", "About", None, QtGui.QApplication.UnicodeUTF8))
         self.action_recursive.setText(QtGui.QApplication.translate("MainWindow", "Include subfolders", None, QtGui.QApplication.UnicodeUTF8))
         self.action_open.setText(QtGui.QApplication.translate("MainWindow", "Open directory", None, QtGui.QApplication.UnicodeUTF8))
@@ -180,3 +218,15 @@ class Ui_MainWindow(object):
         self.action_about_pyside.setText(QtGui.QApplication.translate("MainWindow", "About PySide", None, QtGui.QApplication.UnicodeUTF8))
         self.action_fullscreen.setText(QtGui.QApplication.translate("MainWindow", "Fullscreen", None, QtGui.QApplication.UnicodeUTF8))
         self.action_fullscreen.setShortcut(QtGui.QApplication.translate("MainWindow", "F11", None, QtGui.QApplication.UnicodeUTF8))
+        self.action_smooth.setText(QtGui.QApplication.translate("MainWindow", "Smooth scaling", None, QtGui.QApplication.UnicodeUTF8))
+        self.action_watch.setText(QtGui.QApplication.translate("MainWindow", "Watch for changes", None, QtGui.QApplication.UnicodeUTF8))
+        self.action_overlay.setText(QtGui.QApplication.translate("MainWindow", "Performance overlay", None, QtGui.QApplication.UnicodeUTF8))
+        self.action_overlay.setShortcut(QtGui.QApplication.translate("MainWindow", "F12", None, QtGui.QApplication.UnicodeUTF8))
+        self.action_shuffle.setText(QtGui.QApplication.translate("MainWindow", "Shuffle", None, QtGui.QApplication.UnicodeUTF8))
+        self.action_transition_none.setText(QtGui.QApplication.translate("MainWindow", "None", None, QtGui.QApplication.UnicodeUTF8))
+        self.action_transition_crossfade.setText(QtGui.QApplication.translate("MainWindow", "Crossfade", None, QtGui.QApplication.UnicodeUTF8))
+        self.action_transition_panzoom.setText(QtGui.QApplication.translate("MainWindow", "Pan and zoom", None, QtGui.QApplication.UnicodeUTF8))
+        self.action_undo_delete.setText(QtGui.QApplication.translate("MainWindow", "Undo delete", None, QtGui.QApplication.UnicodeUTF8))
+        self.action_undo_delete.setShortcut(QtGui.QApplication.translate("MainWindow", "Ctrl+Z", None, QtGui.QApplication.UnicodeUTF8))
+
+from slideview import SlideLabel